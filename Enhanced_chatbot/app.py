@@ -2,19 +2,23 @@ import streamlit as st
 import uuid, time
 from langchain_core.messages import HumanMessage
 from langgraph_backend import (
-    chatbot, title_llm, save_thread_title, get_all_threads,
+    chatbot, title_llm, save_thread_title, list_threads, search_threads,
     update_thread_title, delete_thread
 )
 
 # --- PAGE UI ---
 st.set_page_config(page_title="Chat", layout="wide")
 st.session_state.setdefault("thread_id", None)
-st.session_state.setdefault("chat_threads", get_all_threads())
+st.session_state.setdefault("chat_threads", {})
 st.session_state.setdefault("message_history", [])
 st.session_state.setdefault("rename_thread", None)
 st.session_state.setdefault("confirm_delete", None)
 st.session_state.setdefault("search_query", "")
 st.session_state.setdefault("stop", False)
+# Sidebar threads loaded so far, the cursor of the next page and the search they belong to
+st.session_state.setdefault("threads_cursor", None)
+st.session_state.setdefault("threads_query", None)
+PAGE_SIZE = 20
 
 # --- Helpers ---
 def load_messages(tid):
@@ -25,6 +29,12 @@ def load_messages(tid):
     except:
         return []
 
+def fetch_threads(cursor=None):
+    # Searches hit the FTS index; otherwise the newest threads first
+    if st.session_state.search_query:
+        return search_threads(st.session_state.search_query, PAGE_SIZE, cursor)
+    return list_threads(PAGE_SIZE, cursor)
+
 def new_chat():
     st.session_state.thread_id = None
     st.session_state.message_history=[]
@@ -42,8 +52,14 @@ st.sidebar.title("Chats")
 if st.sidebar.button("➕ New Chat"):
     new_chat()
 
-st.session_state.search_query = st.sidebar.text_input("Search", st.session_state.search_query)
-threads = get_all_threads(st.session_state.search_query)
+search = st.sidebar.text_input("Search", st.session_state.search_query)
+if search != st.session_state.search_query:
+    st.session_state.search_query = search
+
+# Loaded pages are kept across reruns; only a new search or "Load more" reads the DB
+if st.session_state.threads_query != st.session_state.search_query:
+    st.session_state.chat_threads, st.session_state.threads_cursor = fetch_threads()
+    st.session_state.threads_query = st.session_state.search_query
 
 if st.session_state.rename_thread:
     tid=st.session_state.rename_thread
@@ -70,7 +86,7 @@ if st.session_state.confirm_delete:
         st.session_state.confirm_delete=None; st.rerun()
     st.sidebar.write("---")
 
-for tid,title in threads.items():
+for tid,title in list(st.session_state.chat_threads.items()):
     c1,c2,c3 = st.sidebar.columns([7,1,1])
     if c1.button(title, key="open_"+tid): 
         st.session_state.thread_id=tid
@@ -80,6 +96,11 @@ for tid,title in threads.items():
     if c3.button("🗑️", key="del_"+tid):
         st.session_state.confirm_delete=tid; st.rerun()
 
+if st.session_state.threads_cursor and st.sidebar.button("Load more"):
+    older, st.session_state.threads_cursor = fetch_threads(st.session_state.threads_cursor)
+    st.session_state.chat_threads = {**st.session_state.chat_threads, **older}
+    st.rerun()
+
 # --- MAIN CHAT UI ---
 st.title("Start a conversation" if len(st.session_state.message_history)==0 else "")
 
@@ -96,7 +117,8 @@ if user:
         tid=str(uuid.uuid4())
         st.session_state.thread_id=tid
         save_thread_title(tid,"New Chat")
-        st.session_state.chat_threads[tid]="New Chat"
+        # Insert at the top, where a fresh first page would list it
+        st.session_state.chat_threads = {tid: "New Chat", **st.session_state.chat_threads}
 
     tid = st.session_state.thread_id
     backend = load_messages(tid)
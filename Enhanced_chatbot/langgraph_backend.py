@@ -1,10 +1,12 @@
 from __future__ import annotations
-from typing import TypedDict, Annotated, Dict, List
+from typing import TypedDict, Annotated, Any, Dict, List, Optional, Sequence, Tuple
+import re
 import sqlite3
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.sqlite import SqliteSaver
@@ -20,6 +22,16 @@ class TitleOnly(BaseModel):
 
 title_llm = llm.with_structured_output(TitleOnly)
 
+class NumberedTitle(BaseModel):
+    index: int = Field(description="Number of the query this title is for")
+    title: str = Field(description="Short chat title, max 5 words")
+
+class TitleBatch(BaseModel):
+    titles: List[NumberedTitle]
+
+# Titles many queries per request; see generate_titles()
+titles_llm = llm.with_structured_output(TitleBatch)
+
 # ---------- Graph State ----------
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
@@ -39,9 +51,76 @@ CREATE TABLE IF NOT EXISTS threads (
     title TEXT NOT NULL
 )
 """)
+
+# Full-text search over titles and human/AI message text. `search_docs` holds
+# one row per title or message; `search_fts` indexes it as external content
+# and is kept in sync by the triggers below.
+conn.executescript("""
+CREATE TABLE IF NOT EXISTS search_docs (
+    doc_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_docs_thread ON search_docs(thread_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+    body, content='search_docs', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS search_docs_ai AFTER INSERT ON search_docs BEGIN
+    INSERT INTO search_fts(rowid, body) VALUES (new.rowid, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS search_docs_ad AFTER DELETE ON search_docs BEGIN
+    INSERT INTO search_fts(search_fts, rowid, body) VALUES ('delete', old.rowid, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS search_docs_au AFTER UPDATE ON search_docs BEGIN
+    INSERT INTO search_fts(search_fts, rowid, body) VALUES ('delete', old.rowid, old.body);
+    INSERT INTO search_fts(rowid, body) VALUES (new.rowid, new.body);
+END;
+""")
 conn.commit()
 
-checkpointer = SqliteSaver(conn=conn)
+def _message_text(msg: Any) -> str:
+    content = getattr(msg, "content", "")
+    if isinstance(content, list):
+        content = " ".join(p.get("text", "") for p in content if isinstance(p, dict) and p.get("type") == "text")
+    return str(content).strip()
+
+def _index_title(thread_id: str, title: str):
+    conn.execute(
+        """INSERT INTO search_docs(doc_id, thread_id, kind, body) VALUES(?, ?, 'title', ?)
+        ON CONFLICT(doc_id) DO UPDATE SET body=excluded.body""",
+        (f"title:{thread_id}", thread_id, title),
+    )
+
+class SearchIndexingSaver(SqliteSaver):
+    """SqliteSaver that adds each turn's human/AI messages to the search index
+    as their writes are checkpointed."""
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        super().put_writes(config, writes, task_id, task_path)
+        conf = config["configurable"]
+        docs = []
+        for idx, (channel, value) in enumerate(writes):
+            if channel != "messages":
+                continue
+            for n, msg in enumerate(value if isinstance(value, list) else [value]):
+                if not isinstance(msg, (HumanMessage, AIMessage)):
+                    continue
+                text = _message_text(msg)
+                if text:
+                    kind = "human" if isinstance(msg, HumanMessage) else "ai"
+                    # Keyed on the write itself so a retried task doesn't index twice
+                    docs.append((f"{conf['checkpoint_id']}:{task_id}:{idx}:{n}", str(conf["thread_id"]), kind, text))
+        if docs:
+            with self.lock:
+                conn.executemany(
+                    "INSERT INTO search_docs(doc_id, thread_id, kind, body) VALUES(?, ?, ?, ?) ON CONFLICT(doc_id) DO NOTHING",
+                    docs,
+                )
+                conn.commit()
+
+checkpointer = SearchIndexingSaver(conn=conn)
 
 graph = StateGraph(ChatState)
 graph.add_node("chat_node", chat_node)
@@ -50,36 +129,192 @@ graph.add_edge("chat_node", END)
 chatbot = graph.compile(checkpointer=checkpointer)
 
 # ---------- API ----------
+# `conn` is shared by every Streamlit session and the checkpointer, so all
+# access goes through the checkpointer's lock.
+db_lock = checkpointer.lock
+
 def save_thread_title(thread_id: str, title: str):
-    conn.execute(
-        "INSERT OR REPLACE INTO threads(thread_id, title) VALUES(?, ?)",
-        (thread_id, title)
+    with db_lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO threads(thread_id, title) VALUES(?, ?)",
+            (thread_id, title)
+        )
+        _index_title(thread_id, title)
+        conn.commit()
+
+def save_thread_titles(titles: Dict[str, str]):
+    """Store several titles in one transaction, keeping existing threads in place."""
+    with db_lock:
+        conn.executemany(
+            "INSERT INTO threads(thread_id, title) VALUES(?, ?) ON CONFLICT(thread_id) DO UPDATE SET title=excluded.title",
+            list(titles.items())
+        )
+        for thread_id, title in titles.items():
+            _index_title(thread_id, title)
+        conn.commit()
+
+def _title_batch_prompt(queries: List[str], max_chars: int = 500) -> str:
+    numbered = "\n".join(f"{i}. {q[:max_chars]!r}" for i, q in enumerate(queries, 1))
+    return (
+        "Generate a very short title (max 5 words) for each of these user queries. "
+        "Return one title per query, tagged with the query's number.\n\n" + numbered
+    )
+
+def generate_titles(
+    pairs: Sequence[Tuple[str, str]], batch_size: int = 20, max_concurrency: int = 4, retries: int = 2
+) -> Dict[str, str]:
+    """Title many (thread_id, first_message) pairs and save them in one transaction.
+
+    Pairs are packed `batch_size` per structured-output request; at most
+    `max_concurrency` requests run at once, each retried up to `retries`
+    times. Returns {thread_id: title} for the threads that got one.
+    """
+    pairs = list(pairs)
+    chunks = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+    results = titles_llm.with_retry(stop_after_attempt=retries + 1).batch(
+        [_title_batch_prompt([query for _, query in chunk]) for chunk in chunks],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
     )
-    conn.commit()
+    titles = {}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            print(f"Title generation error: {result}")
+            continue
+        for item in result.titles:
+            if 1 <= item.index <= len(chunk) and item.title.strip():
+                titles[chunk[item.index - 1][0]] = item.title.strip()
+    if titles:
+        save_thread_titles(titles)
+    return titles
+
+def backfill_titles(**kwargs) -> Dict[str, str]:
+    """Title every thread still called "New Chat" from its first message."""
+    with db_lock:
+        rows = conn.execute(
+            """SELECT d.thread_id, d.body FROM search_docs d JOIN threads t ON t.thread_id = d.thread_id
+            WHERE t.title = 'New Chat' AND d.kind = 'human'
+            AND d.rowid = (SELECT MIN(rowid) FROM search_docs WHERE thread_id = d.thread_id AND kind = 'human')"""
+        ).fetchall()
+    return generate_titles(rows, **kwargs)
 
 def get_all_threads(search: str = "") -> Dict[str, str]:
-    if search:
-        cur = conn.execute(
-            "SELECT thread_id, title FROM threads WHERE LOWER(title) LIKE LOWER(?) ORDER BY rowid DESC",
-            (f"%{search}%",),
-        )
-    else:
-        cur = conn.execute("SELECT thread_id, title FROM threads ORDER BY rowid DESC")
-    return {row[0]: row[1] for row in cur.fetchall()}
+    with db_lock:
+        if search:
+            cur = conn.execute(
+                "SELECT thread_id, title FROM threads WHERE LOWER(title) LIKE LOWER(?) ORDER BY rowid DESC",
+                (f"%{search}%",),
+            )
+        else:
+            cur = conn.execute("SELECT thread_id, title FROM threads ORDER BY rowid DESC")
+        return {row[0]: row[1] for row in cur.fetchall()}
+
+def list_threads(limit: int = 20, after_cursor: Optional[str] = None) -> Tuple[Dict[str, str], Optional[str]]:
+    """One page of threads, newest first, keyed on rowid -> (threads, next_cursor or None)."""
+    with db_lock:
+        if after_cursor:
+            cur = conn.execute(
+                "SELECT rowid, thread_id, title FROM threads WHERE rowid < ? ORDER BY rowid DESC LIMIT ?",
+                (int(after_cursor), limit + 1),
+            )
+        else:
+            cur = conn.execute("SELECT rowid, thread_id, title FROM threads ORDER BY rowid DESC LIMIT ?", (limit + 1,))
+        rows = cur.fetchall()
+    page = rows[:limit]
+    next_cursor = str(page[-1][0]) if len(rows) > limit else None
+    return {row[1]: row[2] for row in page}, next_cursor
+
+def _fts_query(text: str) -> str:
+    # Every word must match, the last one as a prefix so results update while typing
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{w}"' for w in words[:-1]) + (f' "{words[-1]}"*' if words else "")
+
+# Most matching messages ranked per search. bm25 has to score every match
+# before FTS5 can sort by it, so only the newest matches are scored; a search
+# whose term is rarer than this is ranked exactly.
+SEARCH_MAX_CANDIDATES = 1000
+
+def search_threads(query: str, limit: int = 20, after_cursor: Optional[str] = None) -> Tuple[Dict[str, str], Optional[str]]:
+    """Threads whose title or messages match `query`, best match first.
+
+    Each thread is ranked by its best-scoring message among the newest
+    SEARCH_MAX_CANDIDATES matches. Returns ({thread_id: title}, next_cursor
+    or None); the cursor is the (score, thread_id) of the last thread returned.
+    """
+    match = _fts_query(query)
+    if not match:
+        return {}, None
+    with db_lock:
+        # Matches come out of the index in rowid order, so LIMIT stops the scan early
+        rows = conn.execute(
+            """SELECT d.thread_id, m.score
+            FROM (SELECT rowid, bm25(search_fts) AS score FROM search_fts
+                  WHERE search_fts MATCH ? ORDER BY rowid DESC LIMIT ?) m
+            JOIN search_docs d ON d.rowid = m.rowid""",
+            (match, SEARCH_MAX_CANDIDATES),
+        ).fetchall()
+        best: Dict[str, float] = {}
+        for thread_id, score in rows:
+            if thread_id not in best or score < best[thread_id]:
+                best[thread_id] = score
+        ranked = sorted((score, thread_id) for thread_id, score in best.items())
+        if after_cursor:
+            score, _, thread_id = after_cursor.partition("|")
+            ranked = [r for r in ranked if r > (float(score), thread_id)]
+        page = ranked[:limit]
+        titles = dict(conn.execute(
+            f"SELECT thread_id, title FROM threads WHERE thread_id IN ({','.join('?' * len(page))})",
+            [thread_id for _, thread_id in page],
+        ).fetchall())
+    next_cursor = f"{page[-1][0]!r}|{page[-1][1]}" if len(ranked) > limit else None
+    return {thread_id: titles.get(thread_id, "New Chat") for _, thread_id in page}, next_cursor
+
+def rebuild_search_index():
+    """(Re)index every title and the messages of every checkpointed thread."""
+    threads = list(get_all_threads().items())
+    with db_lock:
+        conn.execute("DELETE FROM search_docs")
+        for thread_id, title in threads:
+            _index_title(thread_id, title)
+        conn.commit()
+    docs = []
+    for thread_id, _ in threads:
+        state = chatbot.get_state({"configurable": {"thread_id": thread_id}})
+        for n, msg in enumerate(state.values.get("messages", [])):
+            text = _message_text(msg) if isinstance(msg, (HumanMessage, AIMessage)) else ""
+            if text:
+                kind = "human" if isinstance(msg, HumanMessage) else "ai"
+                docs.append((f"rebuild:{thread_id}:{n}", thread_id, kind, text))
+    with db_lock:
+        conn.executemany("INSERT INTO search_docs(doc_id, thread_id, kind, body) VALUES(?, ?, ?, ?)", docs)
+        conn.commit()
 
 def update_thread_title(thread_id: str, new_title: str):
-    conn.execute("UPDATE threads SET title=? WHERE thread_id=?", (new_title, thread_id))
-    conn.commit()
+    with db_lock:
+        conn.execute("UPDATE threads SET title=? WHERE thread_id=?", (new_title, thread_id))
+        _index_title(thread_id, new_title)
+        conn.commit()
 
 def delete_thread(thread_id: str):
-    conn.execute("DELETE FROM threads WHERE thread_id=?", (thread_id,))
-    try:
-        conn.execute("DELETE FROM checkpoints WHERE thread_id=?", (thread_id,))
-        conn.execute("DELETE FROM checkpoint_blobs WHERE thread_id=?", (thread_id,))
-        conn.execute("DELETE FROM writes WHERE thread_id=?", (thread_id,))
-    except:
-        pass
-    conn.commit()
+    with db_lock:
+        conn.execute("DELETE FROM threads WHERE thread_id=?", (thread_id,))
+        conn.execute("DELETE FROM search_docs WHERE thread_id=?", (thread_id,))
+        try:
+            conn.execute("DELETE FROM checkpoints WHERE thread_id=?", (thread_id,))
+            conn.execute("DELETE FROM checkpoint_blobs WHERE thread_id=?", (thread_id,))
+            conn.execute("DELETE FROM writes WHERE thread_id=?", (thread_id,))
+        except:
+            pass
+        conn.commit()
 
 def touch_thread(thread_id: str):
     pass  # no-op, we removed last_activity feature
+
+# Databases created before search existed get indexed once on startup
+with db_lock:
+    _needs_index = (
+        conn.execute("SELECT 1 FROM search_docs LIMIT 1").fetchone() is None
+        and conn.execute("SELECT 1 FROM threads LIMIT 1").fetchone() is not None
+    )
+if _needs_index:
+    rebuild_search_index()
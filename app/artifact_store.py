@@ -0,0 +1,93 @@
+"""Content-addressed store for large tool and MCP artifacts.
+
+Each artifact is one file named by the SHA-256 of its bytes, so identical
+artifacts are stored once and a reference never goes stale. Graph state and
+the tool_outputs table hold only a small reference dict:
+
+    {"artifact": "sha256:<hex>", "mime_type": "image/png", "size": 48213}
+
+Reads memory-map the file, so a preview of a large artifact touches only
+the pages it needs.
+"""
+import base64
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+_PREFIX = "sha256:"
+
+
+def is_artifact_ref(value: Any) -> bool:
+    return isinstance(value, dict) and str(value.get("artifact", "")).startswith(_PREFIX)
+
+
+class ArtifactStore:
+    """Hash-named files under `root`, fanned out by the first two hex digits."""
+
+    def __init__(self, root: str = "artifacts"):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        if not digest.startswith(_PREFIX):
+            raise ValueError(f"Not an artifact reference: {digest!r}")
+        hexdigest = digest[len(_PREFIX):]
+        if len(hexdigest) != 64 or not all(c in "0123456789abcdef" for c in hexdigest):
+            raise ValueError(f"Not an artifact reference: {digest!r}")
+        return os.path.join(self.root, hexdigest[:2], hexdigest[2:])
+
+    def put(self, data: bytes | str, mime_type: str = "application/octet-stream") -> dict:
+        """Store `data` (if not already stored) and return its reference."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        digest = _PREFIX + hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so readers never see a partial artifact
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        return {"artifact": digest, "mime_type": mime_type, "size": len(data)}
+
+    def put_base64(self, data: str, mime_type: str) -> dict:
+        return self.put(base64.b64decode(data), mime_type)
+
+    def exists(self, ref: dict | str) -> bool:
+        return os.path.exists(self._path(ref["artifact"] if isinstance(ref, dict) else ref))
+
+    @contextmanager
+    def open(self, ref: dict | str) -> Iterator[mmap.mmap | bytes]:
+        """Read-only memory map of the artifact (empty artifacts yield b"")."""
+        path = self._path(ref["artifact"] if isinstance(ref, dict) else ref)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def read_bytes(self, ref: dict | str, limit: Optional[int] = None) -> bytes:
+        with self.open(ref) as mapped:
+            return mapped[:limit] if limit is not None else mapped[:]
+
+    def read_text(self, ref: dict | str, limit: Optional[int] = None) -> str:
+        return self.read_bytes(ref, limit).decode("utf-8", errors="replace")
+
+    def size_on_disk(self) -> int:
+        return sum(
+            os.path.getsize(os.path.join(folder, name))
+            for folder, _, names in os.walk(self.root)
+            for name in names
+        )
+
+
+def store_from_env() -> ArtifactStore:
+    return ArtifactStore(os.environ.get("ARTIFACT_STORE_DIR", "artifacts"))
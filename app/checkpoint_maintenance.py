@@ -0,0 +1,178 @@
+"""Maintenance jobs for the sqlite checkpoint store used by the MCP backend."""
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+# 100-ns intervals between the UUID epoch (1582-10-15) and the Unix epoch,
+# same constant langgraph uses when minting uuid6 checkpoint ids.
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+@dataclass
+class RetentionPolicy:
+    """Which checkpoints survive compaction.
+
+    A checkpoint is kept if ANY enabled rule keeps it. The latest checkpoint
+    of every thread is always kept, and so is everything from the thread's
+    newest message keyframe onwards. Delta-encoded checkpoints are rebuilt by
+    replaying their ancestors' writes, so every kept checkpoint also keeps
+    its parent chain back to its nearest keyframe.
+    """
+    # Always keep the newest N checkpoints of each thread
+    keep_last: Optional[int] = None
+    # Checkpoints older than this many days are dropped unless they sit on a
+    # turn boundary (the "input" checkpoint written when a user turn starts)
+    turn_boundary_after_days: Optional[float] = None
+    # How often the background task runs
+    interval_seconds: float = 3600.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep_last is not None or self.turn_boundary_after_days is not None
+
+
+def policy_from_env() -> RetentionPolicy:
+    """Build the policy from CHECKPOINT_KEEP_LAST / CHECKPOINT_TURN_BOUNDARY_DAYS / CHECKPOINT_COMPACT_INTERVAL."""
+    keep_last = os.environ.get("CHECKPOINT_KEEP_LAST")
+    days = os.environ.get("CHECKPOINT_TURN_BOUNDARY_DAYS")
+    return RetentionPolicy(
+        keep_last=int(keep_last) if keep_last else None,
+        turn_boundary_after_days=float(days) if days else None,
+        interval_seconds=float(os.environ.get("CHECKPOINT_COMPACT_INTERVAL", "3600")),
+    )
+
+
+def _checkpoint_id_at(ts: float) -> str:
+    """Smallest uuid6 checkpoint id minted at or after unix time `ts`.
+
+    Checkpoint ids sort by creation time, so `checkpoint_id < _checkpoint_id_at(ts)`
+    selects rows written before `ts` without deserializing anything.
+    """
+    ticks = int(ts * 10_000_000) + _UUID_EPOCH_OFFSET
+    value = ((ticks >> 12) & 0xFFFFFFFFFFFF) << 80 | (ticks & 0x0FFF) << 64
+    value |= 0x6 << 76  # version 6
+    value |= 0x2 << 62  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+
+def _prune_sql(policy: RetentionPolicy) -> tuple[str, tuple]:
+    # Threads without any keyframe yet compare against '' and keep every row
+    keep = ["rn = 1", "checkpoint_id >= COALESCE(newest_keyframe_id, '')"]
+    params: list = []
+    if policy.keep_last is not None:
+        keep.append("rn <= ?")
+        params.append(policy.keep_last)
+    if policy.turn_boundary_after_days is not None:
+        cutoff = time.time() - policy.turn_boundary_after_days * 86400
+        keep.append("checkpoint_id >= ?")
+        params.append(_checkpoint_id_at(cutoff))
+        keep.append("json_extract(metadata, '$.source') = 'input'")
+    sql = f"""
+    DELETE FROM checkpoints WHERE rowid NOT IN (
+        WITH RECURSIVE ranked AS (
+            SELECT rowid, thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, metadata,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                   ) AS rn,
+                   -- A keyframe is a checkpoint holding the full message list,
+                   -- i.e. one with no pending delta counter for "messages"
+                   json_extract(metadata, '$.counters_since_delta_snapshot.messages') IS NULL AS is_keyframe
+            FROM checkpoints
+        ),
+        flagged AS (
+            SELECT *, MAX(CASE WHEN is_keyframe THEN checkpoint_id END)
+                          OVER (PARTITION BY thread_id, checkpoint_ns) AS newest_keyframe_id
+            FROM ranked
+        ),
+        -- A delta-encoded checkpoint is rebuilt from its ancestors' writes back to
+        -- the nearest keyframe on its own parent chain, so that chain is kept too
+        kept(rowid, thread_id, checkpoint_ns, parent_checkpoint_id, is_keyframe) AS (
+            SELECT rowid, thread_id, checkpoint_ns, parent_checkpoint_id, is_keyframe
+            FROM flagged WHERE {" OR ".join(keep)}
+            UNION
+            SELECT p.rowid, p.thread_id, p.checkpoint_ns, p.parent_checkpoint_id, p.is_keyframe
+            FROM kept k JOIN ranked p
+              ON p.thread_id = k.thread_id
+             AND p.checkpoint_ns = k.checkpoint_ns
+             AND p.checkpoint_id = k.parent_checkpoint_id
+            WHERE NOT k.is_keyframe
+        )
+        SELECT rowid FROM kept
+    )
+    """
+    return sql, tuple(params)
+
+
+async def compact_checkpoints(saver: AsyncSqliteSaver, policy: RetentionPolicy) -> int:
+    """Delete checkpoints the policy does not keep, plus their pending writes.
+
+    Runs under the saver's lock so it never interleaves with a checkpoint write.
+    A saver with an in-memory state cache has it cleared, before and after,
+    so deleted checkpoints are not served from it. Returns the number of
+    checkpoints removed.
+    """
+    if not policy.enabled:
+        return 0
+    await saver.setup()
+    sql, params = _prune_sql(policy)
+    invalidate_all = getattr(saver, "invalidate_all", lambda: None)
+    async with saver.lock:
+        invalidate_all()
+        cur = await saver.conn.execute(sql, params)
+        removed = cur.rowcount
+        await saver.conn.execute("""
+        DELETE FROM writes WHERE NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = writes.thread_id
+              AND c.checkpoint_ns = writes.checkpoint_ns
+              AND c.checkpoint_id = writes.checkpoint_id
+        )
+        """)
+        await saver.conn.commit()
+        invalidate_all()
+        # Fold the WAL back into the main file so it stops growing; freed
+        # pages are reused by later writes instead of extending the file.
+        await saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return removed
+
+
+async def run_compaction_loop(saver: AsyncSqliteSaver, policy: RetentionPolicy):
+    """Background task: compact every `policy.interval_seconds` until cancelled."""
+    while True:
+        try:
+            removed = await compact_checkpoints(saver, policy)
+            if removed:
+                print(f"Checkpoint compaction removed {removed} checkpoints")
+        except Exception as e:
+            print(f"Warning: checkpoint compaction failed: {e}")
+        await asyncio.sleep(policy.interval_seconds)
+
+
+async def thread_catalog(conn) -> list[dict]:
+    """Per-thread checkpoint/write counts and stored bytes, newest thread first.
+
+    Aggregates over the primary-key columns and blob lengths only, so no
+    checkpoint is ever deserialized.
+    """
+    cursor = await conn.execute("""
+    SELECT c.thread_id, c.checkpoints, c.checkpoint_bytes,
+           COALESCE(w.writes, 0), COALESCE(w.write_bytes, 0), c.latest_checkpoint_id
+    FROM (
+        SELECT thread_id, COUNT(*) AS checkpoints,
+               SUM(LENGTH(checkpoint) + LENGTH(metadata)) AS checkpoint_bytes,
+               MAX(checkpoint_id) AS latest_checkpoint_id
+        FROM checkpoints GROUP BY thread_id
+    ) c
+    LEFT JOIN (
+        SELECT thread_id, COUNT(*) AS writes, SUM(LENGTH(value)) AS write_bytes
+        FROM writes GROUP BY thread_id
+    ) w USING (thread_id)
+    ORDER BY c.latest_checkpoint_id DESC
+    """)
+    keys = ("thread_id", "checkpoints", "checkpoint_bytes", "writes", "write_bytes", "latest_checkpoint_id")
+    return [dict(zip(keys, row)) for row in await cursor.fetchall()]
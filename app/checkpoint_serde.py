@@ -0,0 +1,147 @@
+"""Compressing serializer for checkpoint and write blobs."""
+import lzma
+import os
+import sqlite3
+import sys
+import zlib
+from typing import Any, Optional
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class CompressedSerializer(SerializerProtocol):
+    """Wrap another serde and compress its payloads.
+
+    The codec is appended to the stored type tag (`msgpack` -> `msgpack+zlib`),
+    so rows written before compression was enabled still load unchanged, and
+    rows written with one codec keep loading after switching to another.
+    zstd rows made with a trained dictionary are tagged `zstd.<dict_id>`.
+    """
+
+    def __init__(
+        self,
+        codec: str = "zlib",
+        serde: Optional[SerializerProtocol] = None,
+        min_size: int = 256,
+        zstd_dict: Optional[bytes] = None,
+    ):
+        if codec not in ("zlib", "lzma", "zstd"):
+            raise ValueError(f"Unsupported checkpoint compression codec: {codec}")
+        if codec == "zstd" and zstandard is None:
+            raise ImportError("zstd checkpoint compression requires `pip install zstandard`")
+        if zstd_dict is not None and codec != "zstd":
+            raise ValueError(f"A zstd dictionary can only be used with the zstd codec, not {codec}")
+        self.codec = codec
+        self.serde = serde or JsonPlusSerializer()
+        # Tiny payloads (empty writes, counters) don't shrink; store them raw
+        self.min_size = min_size
+        self.zstd_dict = None
+        self.tag = codec
+        if zstd_dict is not None:
+            self.zstd_dict = zstandard.ZstdCompressionDict(zstd_dict)
+            self.zstd_dict.precompute_compress(level=3)
+            self.tag = f"zstd.{self.zstd_dict.dict_id()}"
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return typ, data
+        return f"{typ}+{self.tag}", self._compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        typ, payload = data
+        if "+" not in typ:
+            return self.serde.loads_typed(data)
+        typ, codec = typ.split("+", 1)
+        return self.serde.loads_typed((typ, self.decompress(codec, payload)))
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zlib":
+            return zlib.compress(data, 6)
+        if self.codec == "lzma":
+            return lzma.compress(data)
+        # zstd (de)compressor objects are not thread-safe; they are cheap to
+        # build once the dictionary has been precomputed.
+        return zstandard.ZstdCompressor(level=3, dict_data=self.zstd_dict).compress(data)
+
+    def decompress(self, codec: str, payload: bytes) -> bytes:
+        if codec == "zlib":
+            return zlib.decompress(payload)
+        if codec == "lzma":
+            return lzma.decompress(payload)
+        if codec.startswith("zstd"):
+            if zstandard is None:
+                raise ImportError("Reading zstd checkpoints requires `pip install zstandard`")
+            dict_id = codec.partition(".")[2]
+            if dict_id:
+                if self.zstd_dict is None or str(self.zstd_dict.dict_id()) != dict_id:
+                    raise ValueError(f"Checkpoint needs zstd dictionary {dict_id}, which is not loaded")
+                return zstandard.ZstdDecompressor(dict_data=self.zstd_dict).decompress(payload)
+            return zstandard.ZstdDecompressor().decompress(payload)
+        raise ValueError(f"Unknown checkpoint compression codec: {codec}")
+
+
+def serializer_from_env() -> Optional[CompressedSerializer]:
+    """Serde selected by CHECKPOINT_COMPRESSION (none|zlib|lzma|zstd) and CHECKPOINT_ZSTD_DICT."""
+    codec = os.environ.get("CHECKPOINT_COMPRESSION", "zlib").lower()
+    if codec in ("", "none"):
+        return None
+    zstd_dict = None
+    dict_path = os.environ.get("CHECKPOINT_ZSTD_DICT")
+    if codec == "zstd" and dict_path:
+        with open(dict_path, "rb") as f:
+            zstd_dict = f.read()
+    return CompressedSerializer(codec, zstd_dict=zstd_dict)
+
+
+def train_zstd_dictionary(db_path: str, out_path: str, dict_size: int = 112_640, max_samples: int = 5000) -> int:
+    """Train a zstd dictionary on the most recent blobs in `db_path` and save it to `out_path`.
+
+    Already-compressed rows are decompressed first, so the dictionary is
+    always trained on raw payloads. Rows made with an earlier dictionary are
+    read with CHECKPOINT_ZSTD_DICT if that file exists yet (it may be the
+    `out_path` being trained for the first time). Returns the new dictionary id.
+    """
+    if zstandard is None:
+        raise ImportError("Training a dictionary requires `pip install zstandard`")
+    dict_path = os.environ.get("CHECKPOINT_ZSTD_DICT")
+    if dict_path and os.path.exists(dict_path):
+        with open(dict_path, "rb") as f:
+            reader = CompressedSerializer("zstd", zstd_dict=f.read())
+    else:
+        reader = CompressedSerializer()
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT type, checkpoint FROM checkpoints ORDER BY checkpoint_id DESC LIMIT ?",
+        (max_samples,),
+    ).fetchall()
+    rows += conn.execute(
+        "SELECT type, value FROM writes ORDER BY checkpoint_id DESC LIMIT ?",
+        (max_samples,),
+    ).fetchall()
+    conn.close()
+
+    samples = []
+    for typ, payload in rows:
+        if not payload:
+            continue
+        if typ and "+" in typ:
+            payload = reader.decompress(typ.split("+", 1)[1], payload)
+        samples.append(bytes(payload))
+
+    trained = zstandard.train_dictionary(dict_size, samples)
+    with open(out_path, "wb") as f:
+        f.write(trained.as_bytes())
+    return trained.dict_id()
+
+
+if __name__ == "__main__":
+    # python checkpoint_serde.py chatbot.db checkpoint.zdict
+    db, out = sys.argv[1:3]
+    print(f"Trained zstd dictionary {train_zstd_dictionary(db, out)} -> {out}")
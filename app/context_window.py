@@ -0,0 +1,105 @@
+"""Assemble the message list sent to the LLM under a token budget."""
+import os
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+
+# Budget for system prompt + history, counted locally (approx. 4 chars/token)
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", "12000"))
+# Tool outputs from earlier turns are cut to this many characters
+CONTEXT_OLD_TOOL_CHARS = int(os.environ.get("CONTEXT_OLD_TOOL_CHARS", "300"))
+
+
+def _last_turn_start(messages: list[BaseMessage]) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return i
+    return 0
+
+
+def collapse_old_tool_outputs(messages: list[BaseMessage], max_chars: int = CONTEXT_OLD_TOOL_CHARS) -> list[BaseMessage]:
+    """Shorten ToolMessage payloads from turns before the current one.
+
+    The ToolMessage itself (and its tool_call_id) stays, so every tool call
+    still has its result; only the raw payload is cut.
+    """
+    current = _last_turn_start(messages)
+    collapsed = []
+    for i, message in enumerate(messages):
+        if i < current and isinstance(message, ToolMessage):
+            text = message.text
+            if len(text) > max_chars:
+                message = message.model_copy(
+                    update={"content": f"{text[:max_chars]}... [truncated {len(text) - max_chars} chars]"}
+                )
+        collapsed.append(message)
+    return collapsed
+
+
+def build_context(
+    system_prompt: SystemMessage,
+    messages: list[BaseMessage],
+    max_tokens: int = CONTEXT_MAX_TOKENS,
+    summary: str | None = None,
+) -> list[BaseMessage]:
+    """System prompt plus as many recent whole turns as fit in `max_tokens`.
+
+    History is cut only at a HumanMessage, so tool calls and their results are
+    never separated. The current turn is always sent, even if it alone is over
+    budget. A rolling summary of older turns, if any, is added to the system
+    prompt.
+    """
+    if summary:
+        system_prompt = SystemMessage(
+            content=f"{system_prompt.content}\n\nSummary of the earlier conversation:\n{summary}"
+        )
+    messages = collapse_old_tool_outputs(messages)
+    budget = max_tokens - count_tokens_approximately([system_prompt])
+    window = trim_messages(
+        messages,
+        max_tokens=max(budget, 0),
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        start_on="human",
+    )
+    if not window:
+        window = messages[_last_turn_start(messages):]
+    return [system_prompt] + window
+
+
+# Rolling summary: once the unsummarized history passes SUMMARY_TRIGGER_TOKENS,
+# everything but the last SUMMARY_KEEP_TURNS turns is folded into the summary.
+SUMMARY_TRIGGER_TOKENS = int(os.environ.get("SUMMARY_TRIGGER_TOKENS", "8000"))
+SUMMARY_KEEP_TURNS = int(os.environ.get("SUMMARY_KEEP_TURNS", "4"))
+
+
+def unsummarized(messages: list[BaseMessage], summary_upto: str | None) -> list[BaseMessage]:
+    """Messages after the last one already folded into the summary."""
+    if summary_upto:
+        for i, message in enumerate(messages):
+            if message.id == summary_upto:
+                return messages[i + 1:]
+    return messages
+
+
+def messages_to_fold(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """Oldest whole turns to fold into the summary, or [] if under the threshold."""
+    if count_tokens_approximately(messages) < SUMMARY_TRIGGER_TOKENS:
+        return []
+    turn_starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if len(turn_starts) <= SUMMARY_KEEP_TURNS:
+        return []
+    return messages[:turn_starts[-SUMMARY_KEEP_TURNS]]
+
+
+def render_for_summary(messages: list[BaseMessage], tool_chars: int = CONTEXT_OLD_TOOL_CHARS) -> str:
+    lines = []
+    for message in messages:
+        text = message.text
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {text}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool {message.name or ''}: {text[:tool_chars]}")
+        elif text:
+            lines.append(f"Assistant: {text}")
+    return "\n".join(lines)
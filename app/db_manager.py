@@ -0,0 +1,103 @@
+"""Shared SQLite access for the MCP backend: one serialized writer, a few readers."""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+import aiosqlite
+
+WriteJob = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+class ConnectionManager:
+    """Owns every connection to the backend database.
+
+    All writes, including the checkpointer's, go through a single writer
+    connection guarded by `write_lock`. Registry writes are queued and applied
+    by one worker task, which groups whatever is queued into one transaction
+    (each job in its own savepoint) so bursts cost a single commit. Reads use
+    a small pool of read-only connections, which WAL mode lets run alongside
+    the writer instead of hitting "database is locked".
+
+    Must be opened and used on the backend event loop.
+    """
+
+    def __init__(self, path: str, readers: int = 3, max_batch: int = 64):
+        self.path = path
+        self.readers = readers
+        self.max_batch = max_batch
+        self.write_lock = asyncio.Lock()
+        self._writer: aiosqlite.Connection | None = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pool: asyncio.Queue = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def writer(self) -> aiosqlite.Connection:
+        return self._writer
+
+    async def open(self) -> "ConnectionManager":
+        self._writer = await aiosqlite.connect(self.path)
+        await self._writer.execute("PRAGMA journal_mode=WAL")
+        await self._writer.execute("PRAGMA busy_timeout=5000")
+        for _ in range(self.readers):
+            reader = await aiosqlite.connect(f"file:{self.path}?mode=ro", uri=True)
+            await reader.execute("PRAGMA busy_timeout=5000")
+            self._pool.put_nowait(reader)
+        self._worker = asyncio.create_task(self._writer_loop())
+        return self
+
+    async def close(self):
+        if self._worker:
+            self._worker.cancel()
+        while not self._pool.empty():
+            await self._pool.get_nowait().close()
+        if self._writer:
+            await self._writer.close()
+
+    async def write(self, job: WriteJob) -> Any:
+        """Queue `job(conn)` for the writer; resolves once its batch has committed."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    @asynccontextmanager
+    async def read(self):
+        """Borrow a read-only connection from the pool."""
+        conn = await self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put_nowait(conn)
+
+    async def _writer_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty() and len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+
+            outcomes = []
+            async with self.write_lock:
+                try:
+                    await self._writer.execute("BEGIN IMMEDIATE")
+                    for job, _ in batch:
+                        await self._writer.execute("SAVEPOINT job")
+                        try:
+                            outcomes.append((True, await job(self._writer)))
+                        except Exception as e:
+                            await self._writer.execute("ROLLBACK TO job")
+                            outcomes.append((False, e))
+                        await self._writer.execute("RELEASE job")
+                    await self._writer.commit()
+                except Exception as e:
+                    await self._writer.rollback()
+                    outcomes = [(False, e)] * len(batch)
+
+            # Results are only published after the commit, so callers always
+            # read their own writes from the pool.
+            for (_, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
@@ -0,0 +1,174 @@
+"""Stream conversations out of chatbot.db into JSONL and/or Parquet.
+
+Runs as its own process on a read-only connection, so it never blocks the
+app (WAL lets readers run alongside the writer). Threads are read, converted
+and written one at a time, each in its own short read, so memory use does
+not grow with the database and WAL checkpoints are not held up.
+
+    python export_conversations.py --jsonl conversations.jsonl --parquet messages.parquet
+    python export_conversations.py --jsonl one.jsonl --thread <thread_id> --since 2026-01-01
+"""
+import argparse
+import json
+import sqlite3
+from typing import Iterable, Iterator, Optional
+
+from langchain_core.messages import message_to_dict
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph.message import add_messages
+
+from checkpoint_serde import serializer_from_env
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def _connect_ro(db_path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+
+
+def iter_threads(
+    db_path: str, thread_ids: Optional[list[str]] = None, since: Optional[str] = None, page_size: int = 500
+) -> Iterator[tuple]:
+    """(thread_id, title, created_at) for every checkpointed thread matching the filters.
+
+    Threads are fetched in pages keyed on thread_id, each page in its own
+    short read, so the export never holds one snapshot open for its whole
+    run (that would stop WAL checkpoints in `compact_checkpoints`).
+    """
+    conn = _connect_ro(db_path)
+    try:
+        sql = """
+        SELECT c.thread_id, t.title, t.created_at
+        FROM (SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > ?) c
+        LEFT JOIN threads t ON t.thread_id = c.thread_id
+        """
+        where, params = [], []
+        if thread_ids:
+            where.append(f"c.thread_id IN ({','.join('?' * len(thread_ids))})")
+            params += thread_ids
+        if since:
+            where.append("t.created_at >= ?")
+            params.append(since)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY c.thread_id LIMIT ?"
+        last = ""
+        while True:
+            # fetchall() ends the read before the page is handed out
+            page = conn.execute(sql, [last, *params, page_size]).fetchall()
+            yield from page
+            if len(page) < page_size:
+                break
+            last = page[-1][0]
+    finally:
+        conn.close()
+
+
+def _load_messages(saver: SqliteSaver, thread_id: str) -> list:
+    config = {"configurable": {"thread_id": thread_id}}
+    checkpoint = saver.get_tuple(config)
+    if checkpoint is None:
+        return []
+    stored = checkpoint.checkpoint["channel_values"].get("messages")
+    if stored is not None:
+        # Full list or keyframe snapshot stored inline
+        return list(getattr(stored, "value", stored))
+    # Delta-encoded: replay the appended messages onto the nearest keyframe
+    history = saver.get_delta_channel_history(config=checkpoint.config, channels=["messages"])["messages"]
+    seed = history.get("seed")
+    messages = list(getattr(seed, "value", seed) or [])
+    for _, _, value in history["writes"]:
+        messages = add_messages(messages, value)
+    return messages
+
+
+def iter_conversations(db_path: str, thread_ids: Optional[list[str]] = None, since: Optional[str] = None) -> Iterator[dict]:
+    """One record per thread: metadata plus its messages as langchain message dicts."""
+    saver = SqliteSaver(_connect_ro(db_path), serde=serializer_from_env())
+    # Tables already exist; skip setup(), which would try to write
+    saver.is_setup = True
+    try:
+        for thread_id, title, created_at in iter_threads(db_path, thread_ids, since):
+            yield {
+                "thread_id": thread_id,
+                "title": title,
+                "created_at": created_at,
+                "messages": [message_to_dict(m) for m in _load_messages(saver, thread_id)],
+            }
+    finally:
+        saver.conn.close()
+
+
+def iter_message_rows(conversations: Iterable[dict]) -> Iterator[dict]:
+    """Flatten conversations into one row per message for columnar output."""
+    for conv in conversations:
+        for seq, message in enumerate(conv["messages"]):
+            data = message["data"]
+            content = data.get("content")
+            yield {
+                "thread_id": conv["thread_id"],
+                "title": conv["title"],
+                "seq": seq,
+                "type": message["type"],
+                "message_id": data.get("id"),
+                "name": data.get("name"),
+                "tool_call_id": data.get("tool_call_id"),
+                "content": content if isinstance(content, str) else json.dumps(content, ensure_ascii=False),
+            }
+
+
+def write_jsonl(conversations: Iterable[dict], path: str) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for conv in conversations:
+            f.write(json.dumps(conv, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    return count
+
+
+def write_parquet(rows: Iterable[dict], path: str, batch_size: int = 5000) -> int:
+    """Write message rows in fixed-size row groups so only one batch is in memory."""
+    if pa is None:
+        raise ImportError("Parquet export requires `pip install pyarrow`")
+    schema = pa.schema([
+        ("thread_id", pa.string()), ("title", pa.string()), ("seq", pa.int32()),
+        ("type", pa.string()), ("message_id", pa.string()), ("name", pa.string()),
+        ("tool_call_id", pa.string()), ("content", pa.string()),
+    ])
+    count = 0
+    batch = []
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export conversations from the chatbot database")
+    parser.add_argument("--db", default="chatbot.db")
+    parser.add_argument("--jsonl", help="write one conversation per line to this file")
+    parser.add_argument("--parquet", help="write one row per message to this Parquet file")
+    parser.add_argument("--thread", action="append", dest="threads", help="only export this thread (repeatable)")
+    parser.add_argument("--since", help="only threads created on/after this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+    if not (args.jsonl or args.parquet):
+        parser.error("pass --jsonl and/or --parquet")
+
+    # Each output re-streams the database rather than buffering it
+    if args.jsonl:
+        n = write_jsonl(iter_conversations(args.db, args.threads, args.since), args.jsonl)
+        print(f"Wrote {n} conversations to {args.jsonl}")
+    if args.parquet:
+        n = write_parquet(iter_message_rows(iter_conversations(args.db, args.threads, args.since)), args.parquet)
+        print(f"Wrote {n} messages to {args.parquet}")
@@ -0,0 +1,182 @@
+"""Deterministic local chat model for offline benchmarks and load tests.
+
+Stands in for Gemini (LLM_PROVIDER=fake) with configurable latency and
+output shape, so the graph, checkpointer and streaming pipeline can be
+measured without network access. The same input always gives the same
+output.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_VOCAB = (
+    "the a model graph state tool answer result data thread message stream token cache "
+    "value request response simple quick local test check step next first then and of to in"
+).split()
+
+
+def _sample_value(schema: dict, rng: random.Random) -> Any:
+    """A value that satisfies a JSON schema well enough for tool-call parsing."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        return _sample_value(schema["anyOf"][0], rng)
+    kind = schema.get("type", "string")
+    if kind == "object":
+        props = schema.get("properties", {})
+        return {name: _sample_value(spec, rng) for name, spec in props.items()}
+    if kind == "array":
+        return [_sample_value(schema.get("items", {}), rng)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    return " ".join(rng.choice(_VOCAB) for _ in range(3))
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that fakes latency, text, streaming and tool calls.
+
+    - `ttft`: seconds before the first token.
+    - `tokens_per_second`: pace of the following tokens.
+    - `response_tokens`: answer length in words.
+    - `tool_call_probability`: chance of calling a bound tool instead of
+      answering, applied only right after a user message so tool loops end.
+
+    A forced `tool_choice`, as used by `with_structured_output`, always
+    yields a call to that tool.
+    """
+
+    ttft: float = 0.2
+    tokens_per_second: float = 50.0
+    response_tokens: int = 60
+    tool_call_probability: float = 0.0
+    seed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {
+            "ttft": self.ttft,
+            "tokens_per_second": self.tokens_per_second,
+            "response_tokens": self.response_tokens,
+            "tool_call_probability": self.tool_call_probability,
+            "seed": self.seed,
+        }
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        if tool_choice:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=formatted, **kwargs)
+
+    def _rng(self, messages: list[BaseMessage]) -> random.Random:
+        last = messages[-1].text if messages else ""
+        return random.Random(f"{self.seed}:{len(messages)}:{last}")
+
+    def _reply(self, messages: list[BaseMessage], tools=None, tool_choice=None, **kwargs: Any) -> AIMessage:
+        rng = self._rng(messages)
+        tool = None
+        if tools:
+            if tool_choice and tool_choice not in ("auto", "none"):
+                names = [t["function"]["name"] for t in tools]
+                tool = tools[names.index(tool_choice)] if tool_choice in names else tools[0]
+            elif messages and isinstance(messages[-1], HumanMessage) and rng.random() < self.tool_call_probability:
+                tool = rng.choice(tools)
+        if tool is not None:
+            function = tool["function"]
+            call_id = f"call_{uuid.UUID(int=rng.getrandbits(128)).hex[:12]}"
+            tool_calls = [{"name": function["name"], "args": _sample_value(function.get("parameters", {}), rng), "id": call_id}]
+            content, output_tokens = "", 10
+        else:
+            words = [rng.choice(_VOCAB) for _ in range(self.response_tokens)]
+            tool_calls, content, output_tokens = [], " ".join(words), len(words)
+        input_tokens = count_tokens_approximately(messages)
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return AIMessage(content=content, tool_calls=tool_calls, usage_metadata=usage)
+
+    def _pieces(self, message: AIMessage) -> list[str]:
+        words = message.content.split(" ") if message.content else []
+        return [w if i == 0 else f" {w}" for i, w in enumerate(words)]
+
+    def _total_delay(self, message: AIMessage) -> float:
+        pieces = max(len(self._pieces(message)) - 1, 0)
+        return self.ttft + (pieces / self.tokens_per_second if self.tokens_per_second > 0 else 0)
+
+    def _delay_before(self, index: int) -> float:
+        if index == 0:
+            return self.ttft
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(self, messages, stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs):
+        message = self._reply(messages, **kwargs)
+        time.sleep(self._total_delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs):
+        message = self._reply(messages, **kwargs)
+        await asyncio.sleep(self._total_delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> list[ChatGenerationChunk]:
+        if message.tool_calls:
+            chunk = AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                    for i, c in enumerate(message.tool_calls)
+                ],
+                usage_metadata=message.usage_metadata,
+            )
+            return [ChatGenerationChunk(message=chunk)]
+        pieces = self._pieces(message) or [""]
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=p)) for p in pieces]
+        # Usage is reported once, on the last chunk
+        chunks[-1] = ChatGenerationChunk(
+            message=AIMessageChunk(content=pieces[-1], usage_metadata=message.usage_metadata)
+        )
+        return chunks
+
+    def _stream(self, messages, stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._reply(messages, **kwargs)
+        for i, chunk in enumerate(self._chunks(message)):
+            time.sleep(self._delay_before(i))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._reply(messages, **kwargs)
+        for i, chunk in enumerate(self._chunks(message)):
+            await asyncio.sleep(self._delay_before(i))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def fake_model_from_env(**kwargs: Any) -> FakeChatModel:
+    """FakeChatModel configured from FAKE_LLM_* env vars."""
+    return FakeChatModel(
+        ttft=float(os.environ.get("FAKE_LLM_TTFT_MS", "200")) / 1000,
+        tokens_per_second=float(os.environ.get("FAKE_LLM_TOKENS_PER_SEC", "50")),
+        response_tokens=int(os.environ.get("FAKE_LLM_RESPONSE_TOKENS", "60")),
+        tool_call_probability=float(os.environ.get("FAKE_LLM_TOOL_CALL_PROB", "0")),
+        seed=int(os.environ.get("FAKE_LLM_SEED", "0")),
+        **kwargs,
+    )
@@ -0,0 +1,117 @@
+"""Shared pooled HTTP client for the tools that call external APIs.
+
+One `httpx.AsyncClient` per event loop keeps connections to each API host
+alive between tool calls, caps how many are open per host, and puts hard
+timeouts on every request, so a slow provider costs that tool call only
+and never holds up the backend loop.
+"""
+import asyncio
+import os
+import time
+import weakref
+from typing import Any, Optional
+
+import httpx
+
+
+def _limits_from_env() -> tuple[httpx.Limits, httpx.Timeout]:
+    limits = httpx.Limits(
+        max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", "50")),
+        max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_SECONDS", "30")),
+    )
+    timeout = httpx.Timeout(
+        float(os.environ.get("HTTP_TIMEOUT_SECONDS", "10")),
+        connect=float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", "3")),
+        pool=float(os.environ.get("HTTP_POOL_TIMEOUT_SECONDS", "5")),
+    )
+    return limits, timeout
+
+
+class PooledHTTPClient:
+    """Lazily creates and reuses one `httpx.AsyncClient` per running event loop.
+
+    Clients are bound to the loop they were created on, so a caller on a
+    different loop (a test, a script) gets its own pool instead of a broken one.
+    httpx only limits the pool as a whole, so requests in flight to one host
+    are additionally capped at `per_host`.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[httpx.Limits] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        per_host: Optional[int] = None,
+    ):
+        default_limits, default_timeout = _limits_from_env()
+        self.limits = limits or default_limits
+        self.timeout = timeout or default_timeout
+        self.per_host = per_host or int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._host_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, follow_redirects=True)
+            self._clients[loop] = client
+        return client
+
+    async def get_json(self, url: str, params: Optional[dict[str, Any]] = None) -> Any:
+        """GET `url` and decode the JSON body; raises `httpx.HTTPError` on failure or timeout."""
+        client = self.client()
+        slots = self._host_slots.setdefault(asyncio.get_running_loop(), {})
+        host = httpx.URL(url).host
+        if host not in slots:
+            slots[host] = asyncio.Semaphore(self.per_host)
+        async with slots[host]:
+            response = await client.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        """Close the pool of the current loop."""
+        loop = asyncio.get_running_loop()
+        self._host_slots.pop(loop, None)
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+class TokenBucket:
+    """Client-side rate limit for one API: `rate` calls per second, bursts up to `capacity`.
+
+    A caller takes a token now or reserves the next free one and sleeps
+    until it is due, so waiters are served in order. Use on one event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, calls: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(calls / 60, burst if burst is not None else calls)
+
+    async def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """Wait for a token; False (and nothing taken) if that would take over `max_wait` seconds."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+        if max_wait is not None and wait > max_wait:
+            return False
+        self._tokens -= 1
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+
+http = PooledHTTPClient()
@@ -4,24 +4,47 @@ os.environ["GRPC_ENABLE_FORK_SUPPORT"] = "0"
 os.environ["GRPC_PYTHON_ASYNC_IO_THREADS"] = "1"
 
 from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Annotated
+from langgraph.channels import DeltaChannel
+from typing import TypedDict, Annotated, NotRequired
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_core.tools import tool, BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-import aiosqlite
-import sqlite3
-import requests
+from artifact_store import store_from_env
+from checkpoint_maintenance import policy_from_env, run_compaction_loop, thread_catalog
+from checkpoint_serde import serializer_from_env
+from context_window import build_context, messages_to_fold, render_for_summary, unsummarized
+from db_manager import ConnectionManager
+from fake_llm import fake_model_from_env
+from http_client import TokenBucket, http
+from llm_cache import cache_from_env
+from precompiled_llm import PrecompiledChatGoogleGenerativeAI, toolset_version
+from semantic_cache import is_time_sensitive, semantic_cache_from_env
+from state_cache import StateCacheMixin
+from tool_cache import ToolResultCache, cached_tool
+from tool_output import (
+    TOOL_OUTPUTS_SCHEMA, compact_tool_message, decode_tool_output, externalize_blocks, load_tool_output,
+    project_quote, project_weather, raw_payload, save_tool_output, spill_payload,
+)
+from tool_selection import ToolIndex
+from titler import DeferredTitleRefiner, extractive_title, title_batch_prompt
+from transcript import TranscriptSaver, append_transcript, ensure_transcript_schema, read_transcript, transcript_entry
+import httpx
 import asyncio
 import threading
+import contextvars
+import uuid
+import weakref
+import random
+import time
 import os 
 from datetime import datetime
+from functools import lru_cache
 
 load_dotenv()
 
@@ -43,37 +66,76 @@ def submit_async_task(coro):
 # -------------------
 # 1. LLM
 # -------------------
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+# Exact-match response cache shared by every call on this model (LLM_CACHE_TTL=0 disables)
+llm_cache = cache_from_env()
+# LLM_PROVIDER=fake swaps Gemini for a local deterministic model (FAKE_LLM_* settings)
+# so the graph, checkpointer and streaming can be benchmarked offline. It never
+# uses the response cache: repeated benchmark prompts must hit the model.
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini").lower()
+if LLM_PROVIDER == "fake":
+    llm = fake_model_from_env(cache=False)
+else:
+    # Tool declarations and cache keys are built once per tool-set version, not per call
+    llm = PrecompiledChatGoogleGenerativeAI(model="gemini-2.5-flash", cache=llm_cache)
 
 class TitleOnly(BaseModel):
     title: str = Field(description="Short chat title, max 5 words")
 
 title_llm = llm.with_structured_output(TitleOnly)
 
+class NumberedTitle(BaseModel):
+    index: int = Field(description="Number of the query this title is for")
+    title: str = Field(description="Short chat title, max 5 words")
+
+class TitleBatch(BaseModel):
+    titles: list[NumberedTitle]
+
+# Titles many queries per request; see agenerate_titles()
+titles_llm = llm.with_structured_output(TitleBatch)
+
 # -------------------
 # 2. Tools
 # -------------------
 search_tool = DuckDuckGoSearchRun(region="us-en")
 
+# Client-side limits matching the providers' free tiers; a call that would
+# wait longer than RATE_LIMIT_MAX_WAIT seconds for its turn fails fast instead
+alpha_vantage_limit = TokenBucket.per_minute(float(os.environ.get("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5")))
+weatherstack_limit = TokenBucket.per_minute(float(os.environ.get("WEATHERSTACK_CALLS_PER_MINUTE", "30")))
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", "20"))
+
+# Both call the shared pooled client (keep-alive, per-host limits, timeouts).
+# Provider failures are returned to the model as {"error": ...} instead of raising.
 @tool
-def get_stock_price(symbol: str) -> dict:
+async def get_stock_price(symbol: str) -> dict:
     """
     Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
     using Alpha Vantage with API key in the URL.
     """
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={os.environ.get('ALPHA_VANTAGE_API')}"
-    r = requests.get(url)
-    return r.json()
+    if not await alpha_vantage_limit.acquire(max_wait=RATE_LIMIT_MAX_WAIT):
+        return {"error": "Alpha Vantage rate limit reached; try again in a minute"}
+    params = {"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": os.environ.get("ALPHA_VANTAGE_API")}
+    try:
+        data = await http.get_json("https://www.alphavantage.co/query", params=params)
+    except httpx.HTTPError as e:
+        return {"error": f"Stock price request failed: {e!r}"}
+    # Quota and key problems come back as HTTP 200 with a note instead of a quote
+    if "Global Quote" not in data and ("Note" in data or "Information" in data):
+        return {"error": data.get("Note") or data.get("Information")}
+    return data
 
 @tool
-def get_weather_data(city: str) -> str:
+async def get_weather_data(city: str) -> str:
     """
     This function fetches the current weather data for a given city
     """
-    WEATHER_STACK_API = os.environ.get('WEATHER_STACK_API')
-    url = f'https://api.weatherstack.com/current?access_key={WEATHER_STACK_API}&query={city}'
-    response = requests.get(url)
-    return response.json()
+    if not await weatherstack_limit.acquire(max_wait=RATE_LIMIT_MAX_WAIT):
+        return {"error": "Weatherstack rate limit reached; try again in a minute"}
+    params = {"access_key": os.environ.get("WEATHER_STACK_API"), "query": city}
+    try:
+        return await http.get_json("https://api.weatherstack.com/current", params=params)
+    except httpx.HTTPError as e:
+        return {"error": f"Weather request failed: {e!r}"}
 
 @tool
 def get_current_datetime() -> dict:
@@ -126,48 +188,198 @@ def load_mcp_tools() -> list[BaseTool]:
         print(f"Error loading MCP tools: {e}")
         return []
 
+# Fix for missing 'type' in MCP tool schema properties which breaks Pydantic validation in Gemini
+def fix_mcp_tool_schemas(mcp_tools: list[BaseTool]):
+    for t in mcp_tools:
+        if hasattr(t, "args_schema") and isinstance(t.args_schema, dict):
+            props = t.args_schema.get("properties", {})
+            for prop_name, prop_def in props.items():
+                if isinstance(prop_def, dict) and "type" not in prop_def:
+                    prop_def["type"] = "string"
+
 mcp_tools = load_mcp_tools()
+fix_mcp_tool_schemas(mcp_tools)
+
+# Results of the external-data tools are shared across users for a while:
+# quotes 60 s, weather 10 min, searches 1 h (TOOL_CACHE=0 disables)
+tool_cache = ToolResultCache(max_entries=int(os.environ.get("TOOL_CACHE_MAX_ENTRIES", "1024")))
+TOOL_CACHE_TTLS = {
+    get_stock_price.name: float(os.environ.get("TOOL_CACHE_TTL_STOCK", "60")),
+    get_weather_data.name: float(os.environ.get("TOOL_CACHE_TTL_WEATHER", "600")),
+    search_tool.name: float(os.environ.get("TOOL_CACHE_TTL_SEARCH", "3600")),
+}
 
-# Fix for missing 'type' in MCP tool schema properties which breaks Pydantic validation in Gemini
-for t in mcp_tools:
-    if hasattr(t, "args_schema") and isinstance(t.args_schema, dict):
-        props = t.args_schema.get("properties", {})
-        for prop_name, prop_def in props.items():
-            if isinstance(prop_def, dict) and "type" not in prop_def:
-                prop_def["type"] = "string"
-
-tools = [search_tool, get_stock_price, get_weather_data, get_current_datetime, *mcp_tools]
+def with_result_cache(tool_list: list[BaseTool]) -> list[BaseTool]:
+    if os.environ.get("TOOL_CACHE", "1").lower() in ("0", "false", "no", "off"):
+        return tool_list
+    return [
+        cached_tool(t, tool_cache, TOOL_CACHE_TTLS[t.name]) if TOOL_CACHE_TTLS.get(t.name, 0) > 0 else t
+        for t in tool_list
+    ]
+
+_data_tools = with_result_cache([search_tool, get_stock_price, get_weather_data])
+_cached_tools = {t.name: t for t in _data_tools}
+
+# Multi-symbol / multi-city variants: one tool call instead of one LLM round
+# trip per item. Neither free tier has a batch endpoint, so items fan out to
+# the single-item tools (and so share their cache and rate limit), at most
+# BATCH_TOOL_CONCURRENCY at a time.
+BATCH_TOOL_CONCURRENCY = int(os.environ.get("BATCH_TOOL_CONCURRENCY", "4"))
+BATCH_TOOL_MAX_ITEMS = int(os.environ.get("BATCH_TOOL_MAX_ITEMS", "10"))
+
+async def _fan_out(tool_name: str, arg: str, values: list[str], compact) -> dict:
+    values = list(dict.fromkeys(v.strip() for v in values if v.strip()))
+    skipped = values[BATCH_TOOL_MAX_ITEMS:]
+    slots = asyncio.Semaphore(BATCH_TOOL_CONCURRENCY)
+
+    async def one(value):
+        async with slots:
+            try:
+                return compact(await _cached_tools[tool_name].ainvoke({arg: value}))
+            except Exception as e:
+                return {"error": str(e)}
+
+    results = await asyncio.gather(*(one(v) for v in values[:BATCH_TOOL_MAX_ITEMS]))
+    merged = dict(zip(values, results))
+    if skipped:
+        merged["skipped"] = {"error": f"At most {BATCH_TOOL_MAX_ITEMS} per call", "items": skipped}
+    return merged
+
+@tool
+async def get_stock_prices(symbols: list[str]) -> dict:
+    """
+    Fetch the latest price of several stock symbols at once (e.g. ['AAPL', 'MSFT', 'TSLA']).
+    Use this instead of repeated get_stock_price calls when comparing or listing stocks.
+    """
+    return await _fan_out(get_stock_price.name, "symbol", [s.upper() for s in symbols], project_quote)
+
+@tool
+async def get_weather_for_cities(cities: list[str]) -> dict:
+    """
+    Fetch the current weather for several cities at once.
+    Use this instead of repeated get_weather_data calls when comparing or listing cities.
+    """
+    return await _fan_out(get_weather_data.name, "city", cities, project_weather)
+
+BUILTIN_TOOLS = [*_data_tools, get_stock_prices, get_weather_for_cities, get_current_datetime]
+tools = [*BUILTIN_TOOLS, *mcp_tools]
 llm_with_tools = llm.bind_tools(tools) if tools else llm
 
+def tools_version(tool_list: list[BaseTool]) -> str:
+    return toolset_version([convert_to_openai_tool(t) for t in tool_list])
+
+# Bumped by refresh_mcp_tools() when the MCP servers expose a different tool set
+TOOLSET_VERSION = tools_version(tools)
+
+# Each turn binds only the TOOL_TOP_K tools that best match the user's latest
+# message (plus any used in this or the previous turn); 0 binds them all
+TOOL_TOP_K = int(os.environ.get("TOOL_TOP_K", "6"))
+tool_index = ToolIndex(tools)
+_tools_by_name = {t.name: t for t in tools}
+
+@lru_cache(maxsize=64)
+def _bind_tool_subset(names: tuple[str, ...]):
+    return llm.bind_tools([_tools_by_name[name] for name in names])
+
+def llm_for_turn(messages: list[BaseMessage]):
+    """The model bound to the tools selected for the current turn."""
+    turn_starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if TOOL_TOP_K <= 0 or len(tools) <= TOOL_TOP_K or not turn_starts:
+        return llm_with_tools
+    since = turn_starts[-2] if len(turn_starts) > 1 else 0
+    used = {call["name"] for m in messages[since:] if isinstance(m, AIMessage) for call in m.tool_calls}
+    return _bind_tool_subset(tool_index.select(messages[turn_starts[-1]].text, TOOL_TOP_K, always=used))
+
 # -------------------
 # 3. Graph State
 # -------------------
+def add_message_batches(messages: list[BaseMessage], batches: list) -> list[BaseMessage]:
+    """Batched form of `add_messages`, as required by `DeltaChannel`."""
+    for batch in batches:
+        messages = add_messages(messages, batch)
+    return messages
+
+# Checkpoints store only the messages appended since their parent; a full
+# keyframe of the list is written every MESSAGES_SNAPSHOT_EVERY updates.
+MESSAGES_SNAPSHOT_EVERY = int(os.environ.get("MESSAGES_SNAPSHOT_EVERY", "50"))
+
 class ChatState(TypedDict):
-    messages: Annotated[list[BaseMessage], add_messages]
+    messages: Annotated[
+        list[BaseMessage],
+        DeltaChannel(add_message_batches, snapshot_frequency=MESSAGES_SNAPSHOT_EVERY),
+    ]
+    # Rolling summary of older turns, and the id of the last message it covers
+    summary: NotRequired[str]
+    summary_upto: NotRequired[str]
 
 # -------------------
 # 4. Nodes
 # -------------------
+# Opt-in (SEMANTIC_CACHE=1): paraphrases of an earlier opening question reuse its answer
+semantic_cache = semantic_cache_from_env()
+# Share of semantic hits re-answered by the model in the background to catch false hits
+SEMANTIC_CACHE_AUDIT_RATE = float(os.environ.get("SEMANTIC_CACHE_AUDIT_RATE", "0.05"))
+
+def _semantic_query(state: ChatState) -> str | None:
+    """The question text if this turn may use the semantic cache.
+
+    Only a thread's first message qualifies (no earlier turns or tool results
+    feed into the answer), and never a question about time-dependent data.
+    """
+    if semantic_cache is None or state.get("summary") or len(state["messages"]) != 1:
+        return None
+    message = state["messages"][0]
+    if not isinstance(message, HumanMessage) or is_time_sensitive(message.text):
+        return None
+    return message.text
+
+async def _audit_semantic_hit(model, slot, query, entry, context):
+    try:
+        fresh = await model.ainvoke(context)
+        semantic_cache.audit(slot, query, entry, fresh.text)
+    except Exception as e:
+        print(f"Warning: Semantic cache audit failed: {e}")
+
+# System instruction for model behavior and tool usage (built once; it never changes)
+SYSTEM_PROMPT = SystemMessage(content=(
+    "You are a helpful assistant with access to several tools. "
+    "IMPORTANT: When calling a tool, you MUST provide all required arguments as specified in the tool's schema. "
+    "For example, when using 'add_expense', you MUST provide 'date', 'amount', and 'category'. "
+    "If the user doesn't provide enough information, ask them for the missing details before calling the tool.\n\n"
+    "ANIMATION RULES: When generating code for Manim animations, you MUST NOT use LaTeX. "
+    "The environment does not support it. Use `Text()` instead of `MathTex()`, "
+    "and avoid any LaTeX-specific formatting or symbols."
+))
+
 async def chat_node(state: ChatState):
     """LLM node that may answer or request a tool call."""
     print("DEBUG: Entering chat_node", flush=True)
-    messages = state["messages"]
-    
-    # System instruction for model behavior and tool usage
-    system_prompt = SystemMessage(content=(
-        "You are a helpful assistant with access to several tools. "
-        "IMPORTANT: When calling a tool, you MUST provide all required arguments as specified in the tool's schema. "
-        "For example, when using 'add_expense', you MUST provide 'date', 'amount', and 'category'. "
-        "If the user doesn't provide enough information, ask them for the missing details before calling the tool.\n\n"
-        "ANIMATION RULES: When generating code for Manim animations, you MUST NOT use LaTeX. "
-        "The environment does not support it. Use `Text()` instead of `MathTex()`, "
-        "and avoid any LaTeX-specific formatting or symbols."
-    ))
-    
-    # Prepend the system prompt to the messages sent to the LLM
+    # Turns already folded into the rolling summary are sent as the summary only
+    messages = unsummarized(state["messages"], state.get("summary_upto"))
+
+    # Prepend the system prompt to the recent turns that fit the token budget
+    context = build_context(SYSTEM_PROMPT, messages, summary=state.get("summary"))
+    model = llm_for_turn(messages)
+
+    query = _semantic_query(state)
+    if query is not None:
+        hit = semantic_cache.lookup(query)
+        if hit:
+            slot, entry, score = hit
+            print(f"DEBUG: Semantic cache hit ({score:.2f}) for: {entry.query[:50]}", flush=True)
+            if random.random() < SEMANTIC_CACHE_AUDIT_RATE:
+                # Fresh context so the audit call is not streamed to this run's UI
+                asyncio.create_task(
+                    _audit_semantic_hit(model, slot, query, entry, context), context=contextvars.Context()
+                )
+            return {"messages": [AIMessage(content=entry.answer)]}
+
     print("DEBUG: Calling LLM...", flush=True)
-    response = await llm_with_tools.ainvoke([system_prompt] + messages)
+    started = time.perf_counter()
+    response = await model.ainvoke(context)
     print(f"DEBUG: LLM Response received. Content: {response.content[:100]}...", flush=True)
+    if query is not None and not response.tool_calls and response.text:
+        semantic_cache.add(query, response.text, time.perf_counter() - started)
     
     # Safeguard: Ensure tool_calls 'args' are not None to avoid Pydantic validation errors
     if hasattr(response, "tool_calls") and response.tool_calls:
@@ -179,93 +391,415 @@ async def chat_node(state: ChatState):
         
     return {"messages": [response]}
 
-tool_node = ToolNode(tools) if tools else None
+async def summarize_node(state: ChatState):
+    """Fold the oldest turns into the rolling summary once the thread is long enough."""
+    to_fold = messages_to_fold(unsummarized(state["messages"], state.get("summary_upto")))
+    if not to_fold:
+        return {}
+    prompt = [
+        SystemMessage(content=(
+            "You maintain a running summary of a conversation between a user and an assistant. "
+            "Merge the new conversation excerpt into the existing summary. Keep facts, names, numbers, "
+            "decisions and open questions the assistant may need later. Be concise; output only the summary."
+        )),
+        HumanMessage(content=(
+            f"Existing summary:\n{state.get('summary') or '(none)'}\n\n"
+            f"New excerpt:\n{render_for_summary(to_fold)}"
+        )),
+    ]
+    response = await llm.ainvoke(prompt, config={"tags": ["nostream"]})
+    return {"summary": response.text.strip(), "summary_upto": to_fold[-1].id}
+
+# Tool results enter the thread compacted (see tool_output.py); the original
+# output is kept in the tool_outputs table under the ref in the message artifact.
+# Binary content blocks and raw outputs over TOOL_OUTPUT_INLINE_MAX chars go to
+# the content-addressed artifact store (ARTIFACT_STORE_DIR) and are kept by hash.
+TOOL_OUTPUT_MAX_CHARS = int(os.environ.get("TOOL_OUTPUT_MAX_CHARS", "2000"))
+TOOL_OUTPUT_INLINE_MAX = int(os.environ.get("TOOL_OUTPUT_INLINE_MAX", "8192"))
+artifact_store = store_from_env()
+
+async def compact_tool_result(request, execute):
+    result = await execute(request)
+    if not isinstance(result, ToolMessage):
+        return result
+    artifacts = []
+    if isinstance(result.content, list):
+        content, artifacts = await asyncio.to_thread(externalize_blocks, result.content, artifact_store)
+        result = result.model_copy(update={"content": content})
+    ref = uuid.uuid4().hex
+    compacted = compact_tool_message(result, ref, TOOL_OUTPUT_MAX_CHARS, artifacts)
+    if compacted is None:
+        return result
+    thread_id = ((request.runtime.config if request.runtime else None) or {}).get("configurable", {}).get("thread_id")
+    try:
+        payload = await asyncio.to_thread(spill_payload, raw_payload(result), artifact_store, TOOL_OUTPUT_INLINE_MAX)
+
+        async def _save(conn):
+            await save_tool_output(conn, ref, thread_id, result.name or "", payload)
+        await db.write(_save)
+    except Exception as e:
+        print(f"Warning: Could not store raw tool output: {e}")
+        return result
+    return compacted
+
+tool_node = ToolNode(tools, awrap_tool_call=compact_tool_result) if tools else None
 
 # -------------------
 # 5. Checkpointer
 # -------------------
+# One writer connection (shared with the checkpointer) plus a read-only pool
+db = ConnectionManager("chatbot.db")
+
+# Recently read thread state is served from memory until the thread is written again
+class CachedTranscriptSaver(StateCacheMixin, TranscriptSaver):
+    pass
+
+STATE_CACHE_MAX_BYTES = int(os.environ.get("STATE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
 async def _init_checkpointer():
-    # Regular connection for standard operations
-    conn = await aiosqlite.connect(database="chatbot.db")
+    await db.open()
     # Initialize threads table
-    await conn.execute("""
+    await db.writer.execute("""
     CREATE TABLE IF NOT EXISTS threads (
         thread_id TEXT PRIMARY KEY,
         title TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     """)
-    await conn.commit()
-    return AsyncSqliteSaver(conn)
+    # Newest-first index backing keyset pagination in list_threads()
+    await db.writer.execute(
+        "CREATE INDEX IF NOT EXISTS idx_threads_created ON threads (created_at DESC, thread_id DESC)"
+    )
+    await ensure_transcript_schema(db.writer)
+    await db.writer.execute(TOOL_OUTPUTS_SCHEMA)
+    await db.writer.commit()
+    # Blobs are compressed per CHECKPOINT_COMPRESSION; uncompressed rows still load.
+    # Displayable messages are mirrored into the transcript table as they are written.
+    if STATE_CACHE_MAX_BYTES > 0:
+        saver = CachedTranscriptSaver(
+            db.writer, db=db, serde=serializer_from_env(), cache_max_bytes=STATE_CACHE_MAX_BYTES
+        )
+    else:
+        saver = TranscriptSaver(db.writer, db=db, serde=serializer_from_env())
+    # Checkpoint writes and thread-registry writes are serialized on the same lock
+    saver.lock = db.write_lock
+    await saver.setup()
+    return saver
 
 checkpointer = run_async(_init_checkpointer())
 
+# Background retention/compaction of old checkpoints (off unless configured via env)
+retention_policy = policy_from_env()
+if retention_policy.enabled:
+    submit_async_task(run_compaction_loop(checkpointer, retention_policy))
+
 # -------------------
 # 6. Graph
 # -------------------
-graph = StateGraph(ChatState)
-graph.add_node("chat_node", chat_node)
-graph.add_edge(START, "chat_node")
-
-if tool_node:
-    graph.add_node("tools", tool_node)
-    graph.add_conditional_edges("chat_node", tools_condition)
-    graph.add_edge("tools", "chat_node")
-else:
-    graph.add_edge("chat_node", END)
+# Rebuilt by refresh_mcp_tools() when the tool set changes; runs already in
+# flight keep the graph (and tool node) they started with
+def build_chatbot(tool_node: ToolNode | None):
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", chat_node)
+    graph.add_edge(START, "chat_node")
+
+    if tool_node:
+        graph.add_node("tools", tool_node)
+        graph.add_conditional_edges("chat_node", tools_condition)
+        graph.add_edge("tools", "chat_node")
+    else:
+        graph.add_edge("chat_node", END)
 
-chatbot = graph.compile(checkpointer=checkpointer)
+    # Not part of a turn: applied after the answer has streamed via summarize_thread()
+    graph.add_node("summarize", summarize_node)
+    graph.add_edge("summarize", END)
+
+    return graph.compile(checkpointer=checkpointer)
+
+chatbot = build_chatbot(tool_node)
 
 # -------------------
 # 7. Helper
 # -------------------
 
-# Store title in DB (Keep sync interface for frontend if possible, or use run_async)
-def save_thread_title(thread_id: str, title: str):
-    def _save():
-        conn_sync = sqlite3.connect("chatbot.db")
-        conn_sync.execute(
-            "INSERT OR REPLACE INTO threads (thread_id, title) VALUES (?, ?)",
-            (thread_id, title)
-        )
-        conn_sync.commit()
-        conn_sync.close()
-    
-    _save()
+# Thread registry: async APIs on the backend loop, with sync wrappers for Streamlit
+async def asave_thread_title(thread_id: str, title: str):
+    await db.write(lambda conn: conn.execute(
+        "INSERT OR REPLACE INTO threads (thread_id, title) VALUES (?, ?)",
+        (thread_id, title)
+    ))
+
+# Store several titles in one transaction; existing threads keep their created_at
+async def asave_thread_titles(titles: dict[str, str]):
+    await db.write(lambda conn: conn.executemany(
+        "INSERT INTO threads (thread_id, title) VALUES (?, ?) "
+        "ON CONFLICT(thread_id) DO UPDATE SET title = excluded.title",
+        list(titles.items())
+    ))
+
+# LLM titles for many (thread_id, first_message) pairs, stored in one transaction.
+# Pairs are packed `batch_size` per request; at most `max_concurrency` requests
+# run at once and each is retried up to `retries` times. Threads the model
+# skipped are left out of the result.
+async def agenerate_titles(
+    pairs: list[tuple[str, str]], batch_size: int = 20, max_concurrency: int = 4, retries: int = 2
+) -> dict[str, str]:
+    chunks = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+    results = await titles_llm.with_retry(stop_after_attempt=retries + 1).abatch(
+        [title_batch_prompt([query for _, query in chunk]) for chunk in chunks],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+    titles = {}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            print(f"Title generation error: {result}")
+            continue
+        for item in result.titles:
+            if 1 <= item.index <= len(chunk) and item.title.strip():
+                titles[chunk[item.index - 1][0]] = item.title.strip()
+    if titles:
+        await asave_thread_titles(titles)
+    return titles
+
+# Titles come from the local extractive titler by default. With
+# TITLE_LLM_REFINE=1 they are later replaced by LLM titles, requested in
+# batches gathered over TITLE_REFINE_DELAY seconds.
+TITLE_LLM_REFINE = os.environ.get("TITLE_LLM_REFINE", "0").lower() in ("1", "true", "yes", "on")
+title_refiner = DeferredTitleRefiner(
+    agenerate_titles, delay=float(os.environ.get("TITLE_REFINE_DELAY", "5"))
+) if TITLE_LLM_REFINE else None
+
+# Title a new thread from its first message and store it; resolves to the
+# final title (the refined one when refinement is on)
+async def agenerate_thread_title(thread_id: str, query: str) -> str:
+    title = extractive_title(query)
+    await asave_thread_title(thread_id, title)
+    if title_refiner is not None:
+        title = await title_refiner.refine(thread_id, query) or title
+    return title
 
 # Fetch all thread titles from DB -> dict format {thread_id: title}
-def get_all_threads():
-    conn_sync = sqlite3.connect("chatbot.db")
-    cursor = conn_sync.execute("SELECT thread_id, title FROM threads ORDER BY created_at DESC")
-    results = {row[0]: row[1] for row in cursor.fetchall()}
-    conn_sync.close()
-    return results
+async def aget_all_threads():
+    async with db.read() as conn:
+        cursor = await conn.execute("SELECT thread_id, title FROM threads ORDER BY created_at DESC")
+        return {row[0]: row[1] for row in await cursor.fetchall()}
+
+# One page of threads, newest first -> ({thread_id: title}, next_cursor or None).
+# The cursor is the (created_at, thread_id) key of the last row returned.
+async def alist_threads(limit: int = 20, after_cursor: str | None = None):
+    async with db.read() as conn:
+        if after_cursor:
+            created_at, thread_id = after_cursor.split("|", 1)
+            cursor = await conn.execute(
+                """SELECT thread_id, title, created_at FROM threads
+                WHERE (created_at, thread_id) < (?, ?)
+                ORDER BY created_at DESC, thread_id DESC LIMIT ?""",
+                (created_at, thread_id, limit + 1),
+            )
+        else:
+            cursor = await conn.execute(
+                "SELECT thread_id, title, created_at FROM threads ORDER BY created_at DESC, thread_id DESC LIMIT ?",
+                (limit + 1,),
+            )
+        rows = await cursor.fetchall()
+    page = rows[:limit]
+    next_cursor = f"{page[-1][2]}|{page[-1][0]}" if len(rows) > limit else None
+    return {row[0]: row[1] for row in page}, next_cursor
 
 # Delete a thread from both the database and checkpoint storage
+async def adelete_thread(thread_id: str):
+    async def _delete(conn):
+        await conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+        await conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        await conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        await conn.execute("DELETE FROM transcript WHERE thread_id = ?", (thread_id,))
+        await conn.execute("DELETE FROM transcript_backfilled WHERE thread_id = ?", (thread_id,))
+        await conn.execute("DELETE FROM tool_outputs WHERE thread_id = ?", (thread_id,))
+    await db.write(_delete)
+    if isinstance(checkpointer, StateCacheMixin):
+        checkpointer.invalidate(thread_id)
+
+# What the chat UI shows for a thread, as [{"role", "content"}], oldest first
+async def aload_transcript(thread_id: str, last_n: int | None = None):
+    async with db.read() as conn:
+        return await read_transcript(conn, thread_id, last_n)
+
+# Original output of a compacted tool result, by the raw_ref in its artifact
+async def aload_tool_output(ref: str) -> dict | None:
+    async with db.read() as conn:
+        payload = await load_tool_output(conn, ref)
+    return await asyncio.to_thread(decode_tool_output, payload, artifact_store) if payload else None
+
+# Threads checkpointed before the transcript table existed are materialized once,
+# before the graph serves any turn (see the run_async call below). Each is marked
+# in transcript_backfilled, so a thread with nothing to show is not reloaded on
+# every start.
+async def _abackfill_transcripts():
+    async with db.read() as conn:
+        cursor = await conn.execute(
+            """SELECT DISTINCT thread_id FROM checkpoints
+            EXCEPT SELECT DISTINCT thread_id FROM transcript
+            EXCEPT SELECT thread_id FROM transcript_backfilled"""
+        )
+        missing = [row[0] for row in await cursor.fetchall()]
+    for thread_id in missing:
+        state = await chatbot.aget_state({"configurable": {"thread_id": thread_id}})
+        entries = [
+            (f"backfill:{n}", *shown)
+            for n, message in enumerate(state.values.get("messages", []))
+            if (shown := transcript_entry(message))
+        ]
+        await db.write(lambda conn, t=thread_id, e=entries: _abackfill_thread(conn, t, e))
+
+async def _abackfill_thread(conn, thread_id: str, entries: list[tuple]):
+    # Checked on the writer, in the same job as the insert: a thread that got
+    # transcript rows since it was listed keeps them and is not backfilled
+    cursor = await conn.execute("SELECT 1 FROM transcript WHERE thread_id = ? LIMIT 1", (thread_id,))
+    if entries and await cursor.fetchone() is None:
+        await append_transcript(conn, thread_id, entries)
+    await conn.execute("INSERT OR IGNORE INTO transcript_backfilled (thread_id) VALUES (?)", (thread_id,))
+
+# Runs to completion at import, so no live turn can append to a thread mid-backfill
+try:
+    run_async(_abackfill_transcripts())
+except Exception as e:
+    print(f"Warning: Could not backfill transcripts: {e}")
+
+def save_thread_title(thread_id: str, title: str):
+    run_async(asave_thread_title(thread_id, title))
+
+def get_all_threads():
+    return run_async(aget_all_threads())
+
+def generate_titles(pairs: list[tuple[str, str]], **kwargs) -> dict[str, str]:
+    return run_async(agenerate_titles(pairs, **kwargs))
+
+def list_threads(limit: int = 20, after_cursor: str | None = None):
+    return run_async(alist_threads(limit, after_cursor))
+
 def delete_thread(thread_id: str):
     try:
-        conn_sync = sqlite3.connect("chatbot.db")
-        # Delete from threads table
-        conn_sync.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
-        
-        # Manually delete checkpoint data to avoid SqliteSaver issues
-        conn_sync.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
-        conn_sync.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
-        conn_sync.commit()
-        conn_sync.close()
+        run_async(adelete_thread(thread_id))
     except Exception as e:
         print(f"Warning: Could not delete thread {thread_id}: {e}")
 
+def load_transcript(thread_id: str, last_n: int | None = None):
+    return run_async(aload_transcript(thread_id, last_n))
+
+def get_tool_output(ref: str) -> dict | None:
+    return run_async(aload_tool_output(ref))
+
+# Turns and summary updates on one thread are serialized by a per-thread lock
+_thread_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+_summarizing: set[str] = set()
+
+def _thread_lock(thread_id: str) -> asyncio.Lock:
+    lock = _thread_locks.get(thread_id)
+    if lock is None:
+        lock = _thread_locks[thread_id] = asyncio.Lock()
+    return lock
+
+# Run one chat turn, streaming like chatbot.astream(); a summary being computed
+# for the thread meanwhile is discarded instead of overwriting this turn
+async def astream_turn(input, config, **kwargs):
+    async with _thread_lock(config["configurable"]["thread_id"]):
+        async for item in chatbot.astream(input, config=config, **kwargs):
+            yield item
+
+# Update the thread's rolling summary in the background; call once a turn has finished.
+# At most one summary per thread runs at a time.
+async def summarize_thread(thread_id: str):
+    if thread_id in _summarizing:
+        return
+    _summarizing.add(thread_id)
+    config = {"configurable": {"thread_id": thread_id}}
+    try:
+        state = await chatbot.aget_state(config)
+        if not state.values.get("messages"):
+            return
+        update = await summarize_node(state.values)
+        if not update:
+            return
+        async with _thread_lock(thread_id):
+            # A turn that ran meanwhile would make this update fork off a stale
+            # checkpoint; the summary is dropped and redone after that turn
+            head = await checkpointer.aget_tuple(config)
+            if head is None or head.config["configurable"]["checkpoint_id"] != state.config["configurable"]["checkpoint_id"]:
+                return
+            await chatbot.aupdate_state(state.config, update, as_node="summarize")
+    except Exception as e:
+        print(f"Warning: Could not summarize thread {thread_id}: {e}")
+    finally:
+        _summarizing.discard(thread_id)
+
+# Reload the MCP tools. If the tool set changed, everything derived from it is
+# rebuilt: the tool index, the bound models, the precompiled declarations, the
+# tool node and the graph. Each is replaced rather than mutated, so a run in
+# flight never sees a half-updated tool table. Returns whether anything changed.
+async def arefresh_mcp_tools() -> bool:
+    global mcp_tools, tools, llm_with_tools, tool_index, TOOLSET_VERSION, _tools_by_name, tool_node, chatbot
+    try:
+        new_mcp_tools = await client.get_tools()
+    except Exception as e:
+        print(f"Error loading MCP tools: {e}")
+        return False
+    fix_mcp_tool_schemas(new_mcp_tools)
+    new_tools = [*BUILTIN_TOOLS, *new_mcp_tools]
+    version = tools_version(new_tools)
+    if version == TOOLSET_VERSION:
+        return False
+    mcp_tools, tools, TOOLSET_VERSION = new_mcp_tools, new_tools, version
+    _tools_by_name = {t.name: t for t in tools}
+    tool_index = ToolIndex(tools)
+    if isinstance(llm, PrecompiledChatGoogleGenerativeAI):
+        llm.clear_precompiled()
+    _bind_tool_subset.cache_clear()
+    llm_with_tools = llm.bind_tools(tools)
+    tool_node = ToolNode(tools, awrap_tool_call=compact_tool_result)
+    chatbot = build_chatbot(tool_node)
+    return True
+
+def refresh_mcp_tools() -> bool:
+    return run_async(arefresh_mcp_tools())
+
+# Optional periodic MCP tool refresh (MCP_TOOLS_REFRESH_SECONDS, off by default)
+MCP_TOOLS_REFRESH_SECONDS = float(os.environ.get("MCP_TOOLS_REFRESH_SECONDS", "0"))
+
+async def _refresh_mcp_tools_loop():
+    while True:
+        await asyncio.sleep(MCP_TOOLS_REFRESH_SECONDS)
+        if await arefresh_mcp_tools():
+            print(f"MCP tools changed; tool set version is now {TOOLSET_VERSION}")
+
+if MCP_TOOLS_REFRESH_SECONDS > 0:
+    submit_async_task(_refresh_mcp_tools_loop())
+
+
 # ---------------------- For debugging ----------------------
+# Distinct thread ids straight from the checkpoints primary key (no blobs read)
 async def _alist_threads():
-    all_threads = set()
-    async for checkpoint in checkpointer.alist(None):
-        all_threads.add(checkpoint.config["configurable"]["thread_id"])
-    return list(all_threads)
+    async with db.read() as conn:
+        cursor = await conn.execute("SELECT DISTINCT thread_id FROM checkpoints")
+        return [row[0] for row in await cursor.fetchall()]
 
 def retrieve_all_threads():
     return run_async(_alist_threads())
 
+# Per-thread checkpoint counts and sizes
+async def _athread_stats():
+    async with db.read() as conn:
+        return await thread_catalog(conn)
+
+def get_thread_stats():
+    return run_async(_athread_stats())
+
 if __name__ == "__main__":
     print("Available tools:", [t.name for t in tools])
     print("Threads record in DB:", get_all_threads())
+    print("Checkpoint storage per thread:", get_thread_stats())
+    if llm_cache is not None:
+        print("LLM response cache:", llm_cache.stats())
+    if semantic_cache is not None:
+        print("Semantic cache:", semantic_cache.stats())
+    print("Tool result cache:", tool_cache.stats())
@@ -0,0 +1,210 @@
+"""Exact-match cache of chat model responses: an in-memory LRU over an SQLite file.
+
+Plugged in as the chat model's `cache=`, so every call path (`ainvoke`,
+`invoke`, structured output) goes through it. LangChain replays a hit as a
+normal model run, so `stream_mode="messages"` still delivers the answer and
+the UI needs no changes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+# Message fields that change between otherwise identical requests
+_VOLATILE_FIELDS = {"id", "tool_call_id", "response_metadata", "usage_metadata", "additional_kwargs"}
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def _normalize_message(message: Any) -> Any:
+    """A serialized message minus its volatile fields and its tool call ids.
+
+    Only the message's own fields and each tool call's id are dropped; tool
+    call arguments and content blocks are kept exactly, whatever their keys.
+    """
+    if not isinstance(message, dict) or not isinstance(message.get("kwargs"), dict):
+        return message
+    kwargs = {k: v for k, v in message["kwargs"].items() if k not in _VOLATILE_FIELDS}
+    for field in ("tool_calls", "invalid_tool_calls"):
+        if isinstance(kwargs.get(field), list):
+            kwargs[field] = [
+                {k: v for k, v in call.items() if k != "id"} if isinstance(call, dict) else call
+                for call in kwargs[field]
+            ]
+    return {**message, "kwargs": kwargs}
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Stable hash of the request.
+
+    `prompt` is LangChain's serialized message list, minus ids and per-call
+    metadata; `llm_string` already carries the model name, its settings and
+    the bound tool schemas.
+    """
+    try:
+        messages = json.loads(prompt)
+        if isinstance(messages, list):
+            prompt = json.dumps([_normalize_message(m) for m in messages], sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        pass
+    digest = hashlib.sha256()
+    digest.update(prompt.encode())
+    digest.update(b"\0")
+    digest.update(llm_string.encode())
+    return digest.hexdigest()
+
+
+class ResponseCache(BaseCache):
+    """Two-tier response cache with a shared TTL.
+
+    The memory tier is an LRU of `max_entries` generations. The SQLite tier
+    (skipped when `path` is None) survives restarts; it keeps the newest
+    `db_max_entries` rows and promotes hits into memory.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = "llm_cache.db",
+        ttl_seconds: float = 3600,
+        max_entries: int = 512,
+        db_max_entries: int = 5000,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_max_entries = db_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[float, RETURN_VAL_TYPE]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(CACHE_SCHEMA)
+            self._conn.commit()
+
+    def _fresh(self, created_at: float) -> bool:
+        return time.time() - created_at < self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: RETURN_VAL_TYPE):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup_memory(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if not self._fresh(entry[0]):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry[1]
+
+    def _lookup_db(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        row = self._conn.execute(
+            "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or not self._fresh(row[1]):
+            return None
+        try:
+            value = [
+                ChatGeneration(message=messages_from_dict([item["message"]])[0], generation_info=item["info"])
+                for item in json.loads(row[0])
+            ]
+        except Exception as e:
+            print(f"Warning: Dropping unreadable LLM cache entry: {e}")
+            return None
+        self._remember(key, row[1], value)
+        return value
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            value = self._lookup_memory(key)
+            if value is None and self._conn is not None:
+                value = self._lookup_db(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        # Memory hits are answered inline; only the SQLite tier needs a thread
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            value = self._lookup_memory(key)
+            if value is not None:
+                self.hits += 1
+                return value
+        return await super().alookup(prompt, llm_string)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        # Store copies without the message id, so each replay gets a fresh
+        # one from its own run instead of colliding in the thread's history
+        if not all(isinstance(gen, ChatGeneration) for gen in return_val):
+            return
+        return_val = [
+            gen.model_copy(update={"message": gen.message.model_copy(update={"id": None})})
+            for gen in return_val
+        ]
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, return_val)
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(
+                    [{"message": message_to_dict(gen.message), "info": gen.generation_info} for gen in return_val],
+                    default=str,
+                ), now),
+            )
+            self._conn.execute(
+                """DELETE FROM llm_cache WHERE created_at < ? OR key IN (
+                    SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (now - self.ttl_seconds, self.db_max_entries),
+            )
+            self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """Build the cache from LLM_CACHE_* env vars; LLM_CACHE_TTL=0 turns it off."""
+    ttl = float(os.environ.get("LLM_CACHE_TTL", "3600"))
+    if ttl <= 0:
+        return None
+    return ResponseCache(
+        path=os.environ.get("LLM_CACHE_DB", "llm_cache.db") or None,
+        ttl_seconds=ttl,
+        max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "512")),
+        db_max_entries=int(os.environ.get("LLM_CACHE_DB_MAX_ENTRIES", "5000")),
+    )
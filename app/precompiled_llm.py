@@ -0,0 +1,118 @@
+"""Gemini chat model that prepares the static part of each request once, not per call.
+
+`ChatGoogleGenerativeAI` converts the bound tools to Gemini function
+declarations on every call, and the response cache re-serializes them into
+its key. Inside the tool loop that is the same work several times per turn.
+Here both are computed once per tool-set version and reused.
+
+    python precompiled_llm.py    # per-call request-building overhead, before/after
+"""
+import hashlib
+import json
+import time
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import PrivateAttr
+
+# Bound tool lists / cache keys kept before the tables are reset
+_MAX_ENTRIES = 256
+
+
+def toolset_version(tools: Sequence[Any]) -> str:
+    """Content hash of a bound tool list; changes whenever a tool or its schema does."""
+    payload = json.dumps(list(tools), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+class PrecompiledChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """`ChatGoogleGenerativeAI` with memoized tool declarations and cache keys.
+
+    A bound tool list is hashed to its version once (by identity), so a new
+    list with different tools, such as after MCP tools change, gets fresh
+    declarations while rebinding the same tools reuses the old ones.
+    """
+
+    _versions: dict = PrivateAttr(default_factory=dict)
+    _declarations: dict = PrivateAttr(default_factory=dict)
+    _llm_strings: dict = PrivateAttr(default_factory=dict)
+
+    def _version_of(self, tools: Sequence[Any]) -> str:
+        entry = self._versions.get(id(tools))
+        if entry is not None and entry[0] is tools:
+            return entry[1]
+        if len(self._versions) >= _MAX_ENTRIES:
+            self._versions.clear()
+        version = toolset_version(tools)
+        # Holding the list keeps its id from being reused by another object
+        self._versions[id(tools)] = (tools, version)
+        return version
+
+    def _format_tools(self, tools=None, functions=None) -> list | None:
+        source = tools or functions
+        if not isinstance(source, list):
+            return super()._format_tools(tools, functions)
+        key = ("tools" if tools else "functions", self._version_of(source))
+        declarations = self._declarations.get(key)
+        if declarations is None:
+            if len(self._declarations) >= _MAX_ENTRIES:
+                self._declarations.clear()
+            declarations = super()._format_tools(tools, functions)
+            self._declarations[key] = declarations
+        return list(declarations)
+
+    def _get_llm_string(self, stop: Optional[list[str]] = None, **kwargs: Any) -> str:
+        key = []
+        for name, value in sorted(kwargs.items()):
+            if name in ("tools", "functions") and isinstance(value, list):
+                value = self._version_of(value)
+            elif not isinstance(value, (str, int, float, bool, type(None))):
+                # Structured-output and other rich kwargs: no cheap key
+                return super()._get_llm_string(stop=stop, **kwargs)
+            key.append((name, value))
+        key = (tuple(stop or ()), tuple(key))
+        llm_string = self._llm_strings.get(key)
+        if llm_string is None:
+            if len(self._llm_strings) >= _MAX_ENTRIES:
+                self._llm_strings.clear()
+            llm_string = super()._get_llm_string(stop=stop, **kwargs)
+            self._llm_strings[key] = llm_string
+        return llm_string
+
+    def clear_precompiled(self):
+        self._versions.clear()
+        self._declarations.clear()
+        self._llm_strings.clear()
+
+
+def measure_request_overhead(bound_model, messages: list[BaseMessage], n: int = 200) -> float:
+    """Mean microseconds spent building one request (payload and cache key) for a bound model."""
+    model, kwargs = bound_model.bound, bound_model.kwargs
+    started = time.perf_counter()
+    for _ in range(n):
+        model._prepare_request(messages, **kwargs)
+        model._get_llm_string(**kwargs)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+if __name__ == "__main__":
+    import os
+
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langchain_core.tools import StructuredTool
+
+    os.environ.setdefault("GOOGLE_API_KEY", "unused")
+
+    def _sample_tool(i: int):
+        def sample(city: str, days: int = 1, units: str = "metric") -> str:
+            return ""
+        return StructuredTool.from_function(
+            sample, name=f"tool_{i}", description=f"Sample tool {i} that looks something up for a city."
+        )
+
+    sample_tools = [_sample_tool(i) for i in range(12)]
+    sample_messages = [SystemMessage(content="You are a helpful assistant."), HumanMessage(content="hello")]
+    for cls in (ChatGoogleGenerativeAI, PrecompiledChatGoogleGenerativeAI):
+        bound = cls(model="gemini-2.5-flash").bind_tools(sample_tools)
+        print(f"{cls.__name__}: {measure_request_overhead(bound, sample_messages):.0f} us per call")
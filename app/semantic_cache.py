@@ -0,0 +1,176 @@
+"""Near-duplicate answer cache keyed by a local embedding of the user's question.
+
+Embeddings are hashed word and character n-grams (no model, no network),
+held in one preallocated NumPy array, so a lookup is a single matrix-vector
+product; a near match is only served if it also uses the same numbers and
+word order (`same_facts`). Only answers that do not depend on tools, on
+earlier turns or on the current date/time are stored.
+"""
+import os
+import re
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Questions whose answer changes over time are never cached
+_TIME_SENSITIVE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|current(ly)?|latest|recent(ly)?|this (week|month|year)|"
+    r"time|date|weather|forecast|price|stock|news|score|expense)s?\b",
+    re.IGNORECASE,
+)
+
+
+def embed(text: str, dim: int = 1024) -> np.ndarray:
+    """L2-normalized hashing vector of word unigrams/bigrams and char trigrams."""
+    words = _WORD.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        # The top bit picks the sign so collisions tend to cancel out
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def same_facts(a: str, b: str) -> bool:
+    """Whether two questions use the same numbers and their shared words in the same order.
+
+    The embedding is mostly a bag of n-grams, so "convert 30 celsius to
+    fahrenheit" is a near match for "convert 30 fahrenheit to celsius" and for
+    "convert 40 celsius to fahrenheit"; a match must also pass this check.
+    """
+    words_a, words_b = _WORD.findall(a.lower()), _WORD.findall(b.lower())
+    if sorted(w for w in words_a if w.isdigit()) != sorted(w for w in words_b if w.isdigit()):
+        return False
+    shared = set(words_a) & set(words_b)
+    # First occurrences only, so a repeated word does not count as a reordering
+    return list(dict.fromkeys(w for w in words_a if w in shared)) == list(
+        dict.fromkeys(w for w in words_b if w in shared)
+    )
+
+
+def is_time_sensitive(text: str) -> bool:
+    return bool(_TIME_SENSITIVE.search(text))
+
+
+@dataclass
+class SemanticEntry:
+    query: str
+    answer: str
+    latency: float
+    created_at: float
+    hits: int = 0
+
+
+class SemanticCache:
+    """Fixed-capacity nearest-neighbour cache of (question, answer) pairs.
+
+    Rows live in a ring buffer: when full, the oldest entry is overwritten.
+    `audit(...)` records whether a fresh answer agreed with a served one;
+    disagreements count as false hits and evict the entry.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        max_entries: int = 2000,
+        ttl_seconds: float = 24 * 3600,
+        dim: int = 1024,
+        audit_agreement: float = 0.5,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.dim = dim
+        self.audit_agreement = audit_agreement
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries: list[Optional[SemanticEntry]] = [None] * max_entries
+        self._next = 0
+        self.lookups = 0
+        self.hits = 0
+        self.refused = 0
+        self.latency_saved = 0.0
+        self.audits = 0
+        self.false_hits = 0
+        self.audit_log: deque = deque(maxlen=100)
+
+    def lookup(self, query: str) -> Optional[tuple[int, SemanticEntry, float]]:
+        """(slot, entry, similarity) of the best live match above the threshold.
+
+        A match that fails `same_facts` is refused (and counted) rather than served.
+        """
+        self.lookups += 1
+        scores = self._vectors @ embed(query, self.dim)
+        slot = int(np.argmax(scores))
+        score = float(scores[slot])
+        entry = self._entries[slot]
+        if entry is None or score < self.threshold:
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds:
+            self._evict(slot)
+            return None
+        if not same_facts(query, entry.query):
+            self.refused += 1
+            return None
+        entry.hits += 1
+        self.hits += 1
+        self.latency_saved += entry.latency
+        return slot, entry, score
+
+    def add(self, query: str, answer: str, latency: float):
+        slot = self._next
+        self._vectors[slot] = embed(query, self.dim)
+        self._entries[slot] = SemanticEntry(query, answer, latency, time.time())
+        self._next = (slot + 1) % len(self._entries)
+
+    def _evict(self, slot: int):
+        self._vectors[slot] = 0.0
+        self._entries[slot] = None
+
+    def audit(self, slot: int, query: str, served: SemanticEntry, fresh_answer: str):
+        """Compare a served answer with a freshly generated one for `query`."""
+        agreement = float(embed(served.answer, self.dim) @ embed(fresh_answer, self.dim))
+        false_hit = agreement < self.audit_agreement
+        self.audits += 1
+        if false_hit:
+            self.false_hits += 1
+            if self._entries[slot] is served:
+                self._evict(slot)
+        self.audit_log.append({
+            "query": query,
+            "matched_query": served.query,
+            "agreement": round(agreement, 3),
+            "false_hit": false_hit,
+        })
+
+    def stats(self) -> dict:
+        return {
+            "entries": sum(e is not None for e in self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "refused": self.refused,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+            "audits": self.audits,
+            "false_hits": self.false_hits,
+            "false_hit_rate": self.false_hits / self.audits if self.audits else 0.0,
+        }
+
+
+def semantic_cache_from_env() -> Optional[SemanticCache]:
+    """Opt-in via SEMANTIC_CACHE=1; off by default."""
+    if os.environ.get("SEMANTIC_CACHE", "0").lower() not in ("1", "true", "yes", "on"):
+        return None
+    return SemanticCache(
+        threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+        max_entries=int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "2000")),
+        ttl_seconds=float(os.environ.get("SEMANTIC_CACHE_TTL", str(24 * 3600))),
+    )
@@ -0,0 +1,176 @@
+"""In-process LRU cache of recently read thread state, layered over a checkpoint saver."""
+import contextvars
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple
+
+# Bytes of stored blobs deserialized by the current load, if one is being measured
+_loaded_bytes: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("loaded_bytes", default=None)
+
+
+class _MeasuredSerde:
+    """Wraps a saver's serde to count the stored bytes each cached load decodes."""
+
+    def __init__(self, serde):
+        self.serde = serde
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        counter = _loaded_bytes.get()
+        if counter is not None and data[1] is not None:
+            counter[0] += len(data[1])
+        return self.serde.loads_typed(data)
+
+    def __getattr__(self, name):
+        return getattr(self.serde, name)
+
+
+def _copy_tuple(value: CheckpointTuple) -> CheckpointTuple:
+    """Copy of the containers the pregel loop mutates; messages and other values are shared."""
+    checkpoint = value.checkpoint
+    return value._replace(
+        checkpoint={
+            **checkpoint,
+            "channel_values": dict(checkpoint["channel_values"]),
+            "channel_versions": dict(checkpoint["channel_versions"]),
+            "versions_seen": {k: dict(v) for k, v in checkpoint["versions_seen"].items()},
+        },
+        metadata=dict(value.metadata),
+        pending_writes=list(value.pending_writes) if value.pending_writes is not None else None,
+    )
+
+
+def _copy_history(value: dict) -> dict:
+    return {ch: {**entry, "writes": list(entry["writes"])} for ch, entry in value.items()}
+
+
+class ByteLRU:
+    """LRU mapping bounded by the total of the byte sizes given for its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key][0]
+
+    def put(self, key, value, size: int):
+        if size > self.max_bytes:
+            return
+        self.pop(key)
+        self._data[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.bytes -= evicted
+
+    def pop(self, key):
+        if key in self._data:
+            self.bytes -= self._data.pop(key)[1]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class StateCacheMixin:
+    """Serve repeat checkpoint reads of active threads from memory.
+
+    Mix in before an async saver class. Caches `aget_tuple` results (latest
+    or by checkpoint id) and delta-channel histories, and drops everything
+    cached for a thread whenever that thread is written. Every read runs on
+    the saver's event loop, so the cache needs no locking.
+
+    Callers (the pregel loop) mutate the checkpoint containers they load
+    (versions, channel values, pending writes), so every read gets its own
+    copy of those; the messages inside are shared, as nothing mutates them.
+    Entries are sized by the stored (serialized) bytes they were loaded from.
+    """
+
+    def __init__(self, *args, cache_max_bytes: int = 64 * 1024 * 1024, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.serde = _MeasuredSerde(self.serde)
+        self.cache = ByteLRU(cache_max_bytes)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._thread_keys: dict[str, set] = {}
+        # Bumped before and after each write; a read that overlapped a write
+        # sees a different generation and is not cached.
+        self._generation: dict[str, int] = {}
+        # Same, for writes that may touch any thread (see invalidate_all)
+        self._epoch = 0
+
+    def invalidate_all(self):
+        """Drop everything cached, e.g. after rows were deleted behind the saver's back."""
+        self._epoch += 1
+        self.cache = ByteLRU(self.cache.max_bytes)
+        self._thread_keys.clear()
+
+    def invalidate(self, thread_id: str):
+        thread_id = str(thread_id)
+        self._generation[thread_id] = self._generation.get(thread_id, 0) + 1
+        for key in self._thread_keys.pop(thread_id, ()):
+            self.cache.pop(key)
+
+    async def _cached(self, thread_id: str, key, load, copy):
+        value = self.cache.get(key)
+        if value is not None:
+            self.cache_hits += 1
+            return copy(value)
+        self.cache_misses += 1
+        generation = (self._epoch, self._generation.get(thread_id, 0))
+        counter = [0]
+        token = _loaded_bytes.set(counter)
+        try:
+            value = await load()
+        finally:
+            _loaded_bytes.reset(token)
+        if value is None:
+            return None
+        if (self._epoch, self._generation.get(thread_id, 0)) == generation:
+            self.cache.put(key, value, counter[0])
+            self._thread_keys.setdefault(thread_id, set()).add(key)
+        return copy(value)
+
+    async def aget_tuple(self, config: RunnableConfig):
+        conf = config["configurable"]
+        thread_id = str(conf["thread_id"])
+        key = ("tuple", thread_id, conf.get("checkpoint_ns", ""), conf.get("checkpoint_id"))
+        return await self._cached(thread_id, key, lambda: super(StateCacheMixin, self).aget_tuple(config), _copy_tuple)
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        conf = config["configurable"]
+        thread_id = str(conf["thread_id"])
+        key = ("history", thread_id, conf.get("checkpoint_ns", ""), conf.get("checkpoint_id"), tuple(channels))
+        return await self._cached(
+            thread_id, key,
+            lambda: super(StateCacheMixin, self).aget_delta_channel_history(config=config, channels=channels),
+            _copy_history,
+        )
+
+    async def aput(self, config: RunnableConfig, *args, **kwargs):
+        thread_id = config["configurable"]["thread_id"]
+        self.invalidate(thread_id)
+        try:
+            return await super().aput(config, *args, **kwargs)
+        finally:
+            self.invalidate(thread_id)
+
+    async def aput_writes(self, config: RunnableConfig, *args, **kwargs):
+        thread_id = config["configurable"]["thread_id"]
+        self.invalidate(thread_id)
+        try:
+            return await super().aput_writes(config, *args, **kwargs)
+        finally:
+            self.invalidate(thread_id)
+
+    async def adelete_thread(self, thread_id: str):
+        self.invalidate(thread_id)
+        try:
+            return await super().adelete_thread(thread_id)
+        finally:
+            self.invalidate(thread_id)
@@ -5,23 +5,17 @@ from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, AIMess
 
 # Import backend utilities from the new MCP backend
 from langraph_mcp_backend import (
+    artifact_store,
+    astream_turn,
     chatbot,
-    title_llm,
-    save_thread_title,
-    get_all_threads,
+    agenerate_thread_title,
+    list_threads,
+    load_transcript,
     delete_thread,
+    summarize_thread,
     submit_async_task
 )
-
-# -------------------- Title generation LLM --------------------
-def get_ai_title_for_query(query: str) -> str:
-    try:
-        prompt = f"Generate a very short title (max 5 words) for this user query: '{query}'. Only output the title."
-        response = title_llm.invoke(prompt)
-        return response.title.strip()
-    except Exception as e:
-        print(f"Title generation error: {e}")
-        return query[:30] + "..."
+from titler import extractive_title
 
 # -------------------- Utility functions --------------------
 def generate_threadid():
@@ -48,6 +42,31 @@ def delete_chat(thread_id):
     if st.session_state['thread_id'] == thread_id:
         reset_chat()
 
+# Tool artifacts (images, files) are kept in state as hash references and only
+# read from the artifact store when shown
+ARTIFACT_TEXT_PREVIEW_BYTES = 20_000
+
+def render_artifact(ref):
+    mime_type = ref.get("mime_type", "")
+    try:
+        if mime_type.startswith("image/"):
+            st.image(artifact_store.read_bytes(ref))
+        elif mime_type.startswith("video/"):
+            st.video(artifact_store.read_bytes(ref), format=mime_type)
+        elif mime_type.startswith("audio/"):
+            st.audio(artifact_store.read_bytes(ref), format=mime_type)
+        elif mime_type.startswith("text/") or mime_type == "application/json":
+            st.code(artifact_store.read_text(ref, limit=ARTIFACT_TEXT_PREVIEW_BYTES))
+        else:
+            st.download_button(
+                f"Download {mime_type or 'file'} ({ref.get('size', 0):,} bytes)",
+                data=artifact_store.read_bytes(ref),
+                mime=mime_type or None,
+                key=f"download_{ref['artifact']}_{uuid.uuid4().hex[:6]}",
+            )
+    except (OSError, ValueError) as e:
+        st.caption(f"Artifact unavailable: {e}")
+
 def load_conversation(thread_id):
     try:
         state = chatbot.get_state(config={'configurable': {'thread_id': thread_id}})
@@ -56,26 +75,15 @@ def load_conversation(thread_id):
         print(f"Error loading conversation: {e}")
         return []
 
-def extract_message_content(message):
-    """Extract clean text content from AIMessage objects"""
-    content = message.content
-    if isinstance(content, list):
-        # Extract text parts from structured content
-        text_parts = [
-            part.get("text", "")
-            for part in content
-            if isinstance(part, dict) and part.get("type") == "text"
-        ]
-        return "".join(text_parts)
-    return str(content)
-
 # -------------------- Initialize session state --------------------
 if 'message_history' not in st.session_state:
     st.session_state['message_history'] = []
 
-# Load previous chat titles from DB if empty
+THREADS_PAGE_SIZE = 20
+
+# Load the first page of chat titles from DB if empty
 if 'chat_threads' not in st.session_state:
-    st.session_state['chat_threads'] = get_all_threads()
+    st.session_state['chat_threads'], st.session_state['threads_cursor'] = list_threads(THREADS_PAGE_SIZE)
 
 if 'thread_id' not in st.session_state:
     st.session_state['thread_id'] = generate_threadid()
@@ -91,6 +99,17 @@ if st.session_state['thread_id'] not in st.session_state['chat_threads']:
 if 'delete_confirmations' not in st.session_state:
     st.session_state.delete_confirmations = {}
 
+# Titles being generated in the background: thread_id -> future
+if 'pending_titles' not in st.session_state:
+    st.session_state['pending_titles'] = {}
+
+# Pick up titles that finished since the last rerun
+for thread_id, title_task in list(st.session_state['pending_titles'].items()):
+    if title_task.done():
+        del st.session_state['pending_titles'][thread_id]
+        if thread_id in st.session_state['chat_threads'] and title_task.exception() is None:
+            st.session_state['chat_threads'][thread_id] = title_task.result()
+
 # -------------------- Sidebar --------------------
 st.sidebar.title("LangGraph MCP ChatBot")
 
@@ -126,30 +145,20 @@ for thread_id, title in threads_list:
         with col1:
             if st.button(title, key=thread_id, use_container_width=True):
                 st.session_state['thread_id'] = thread_id
-                messages = load_conversation(thread_id)
-
-                temp_messages = []
-                for message in messages:
-                    # Skip ToolMessage (raw JSON tool output)
-                    if isinstance(message, ToolMessage):
-                        continue
-
-                    # Skip AIMessage with empty content (tool call requests)
-                    if isinstance(message, AIMessage) and not message.content:
-                        continue
-
-                    role = "user" if isinstance(message, HumanMessage) else "assistant"
-                    # Extract clean text content from structured AIMessages
-                    content = extract_message_content(message)
-                    temp_messages.append({"role": role, "content": content})
-
-                st.session_state['message_history'] = temp_messages
+                # Transcript rows are already filtered/flattened for display
+                st.session_state['message_history'] = load_transcript(thread_id)
         with col2:
             # Add delete button for each chat
             if st.button("🗑️", key=f"delete_{thread_id}", use_container_width=True):
                 st.session_state.delete_confirmations[thread_id] = True
                 st.rerun()
 
+# Older conversations are fetched one page at a time
+if st.session_state.get('threads_cursor') and st.sidebar.button("Load more"):
+    older, st.session_state['threads_cursor'] = list_threads(THREADS_PAGE_SIZE, st.session_state['threads_cursor'])
+    st.session_state['chat_threads'] = {**st.session_state['chat_threads'], **older}
+    st.rerun()
+
 # **************************************** Main Chat UI *********************************
 
 current_thread = st.session_state['thread_id']
@@ -163,6 +172,8 @@ if len(messages) == 0:
 for message in messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        for ref in message.get("artifacts", []):
+            render_artifact(ref)
 
 user_input = st.chat_input("Type here...")
 
@@ -176,6 +187,14 @@ if user_input:
     with st.chat_message("user"):
         st.write(user_input)
 
+    # Title the new thread locally right away; the stored (and, if enabled,
+    # LLM-refined) title arrives concurrently with the first answer
+    if is_first_message:
+        st.session_state['chat_threads'][st.session_state['thread_id']] = extractive_title(user_input)
+        st.session_state['pending_titles'][st.session_state['thread_id']] = submit_async_task(
+            agenerate_thread_title(st.session_state['thread_id'], user_input)
+        )
+
     # Send to LangGraph
     CONFIG = {
         "configurable": {"thread_id": st.session_state["thread_id"]},
@@ -186,6 +205,7 @@ if user_input:
     # Assistant streaming block
     with st.chat_message("assistant"):
         status_holder = {"box": None}
+        artifacts = []
         message_placeholder = st.empty()
         full_response = ""
 
@@ -194,7 +214,7 @@ if user_input:
 
             async def run_stream():
                 try:
-                    async for message_chunk, metadata in chatbot.astream(
+                    async for message_chunk, metadata in astream_turn(
                         {"messages": [HumanMessage(content=user_input)]},
                         config=CONFIG,
                         stream_mode="messages",
@@ -227,6 +247,11 @@ if user_input:
                             status_holder["box"] = st.status(f"🔧 Using `{tool_name}` …", expanded=True)
                         else:
                             status_holder["box"].update(label=f"🔧 Using `{tool_name}` …", state="running")
+                        if isinstance(message_chunk.artifact, dict):
+                            for ref in message_chunk.artifact.get("artifacts", []):
+                                artifacts.append(ref)
+                                with status_holder["box"]:
+                                    render_artifact(ref)
                         continue
 
                     # Handle AIMessage or AIMessageChunk
@@ -257,14 +282,16 @@ if user_input:
             status_holder["box"].update(label="✅ Tool finished", state="complete", expanded=False)
 
         # Final clean display
-        if ai_message:
+        if ai_message or artifacts:
             message_placeholder.markdown(ai_message)
-            st.session_state['message_history'].append({"role": "assistant", "content": ai_message})
+            st.session_state['message_history'].append(
+                {"role": "assistant", "content": ai_message, "artifacts": artifacts}
+            )
+
+    # Fold older turns into the rolling summary off the critical path
+    submit_async_task(summarize_thread(st.session_state['thread_id']))
 
-    # Handle first-message title creation + DB saving
+    # Redraw the sidebar with the local title; a refined title is picked
+    # up on a later rerun
     if is_first_message:
-        new_title = get_ai_title_for_query(user_input)
-        thread_id = st.session_state['thread_id']
-        save_thread_title(thread_id, new_title)
-        st.session_state['chat_threads'][thread_id] = new_title
         st.rerun()
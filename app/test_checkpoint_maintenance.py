@@ -0,0 +1,111 @@
+"""Compaction must leave every kept checkpoint loadable with its full message list."""
+import asyncio
+from typing import Annotated
+
+import aiosqlite
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.channels import DeltaChannel
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from checkpoint_maintenance import RetentionPolicy, compact_checkpoints
+from state_cache import StateCacheMixin
+
+
+class _CachedSaver(StateCacheMixin, AsyncSqliteSaver):
+    pass
+
+
+def _add_batches(messages: list[BaseMessage], batches: list) -> list[BaseMessage]:
+    for batch in batches:
+        messages = add_messages(messages, batch)
+    return messages
+
+
+class _State(TypedDict):
+    messages: Annotated[list[BaseMessage], DeltaChannel(_add_batches, snapshot_frequency=3)]
+
+
+def _echo(state: _State):
+    return {"messages": [AIMessage(content=f"echo {len(state['messages'])}")]}
+
+
+async def _message_counts(chatbot, config, source=None) -> dict[str, int]:
+    counts = {}
+    async for snapshot in chatbot.aget_state_history(config):
+        if source is None or snapshot.metadata.get("source") == source:
+            counts[snapshot.config["configurable"]["checkpoint_id"]] = len(snapshot.values.get("messages", []))
+    return counts
+
+
+async def _run_compaction(tmp_path, policy: RetentionPolicy, turns: int = 11, saver_class=AsyncSqliteSaver):
+    async with aiosqlite.connect(str(tmp_path / "checkpoints.db")) as conn:
+        saver = saver_class(conn)
+        graph = StateGraph(_State)
+        graph.add_node("echo", _echo)
+        graph.add_edge(START, "echo")
+        graph.add_edge("echo", END)
+        chatbot = graph.compile(checkpointer=saver)
+        config = {"configurable": {"thread_id": "t"}}
+        for turn in range(turns):
+            await chatbot.ainvoke({"messages": [HumanMessage(content=f"message {turn}")]}, config)
+
+        before = await _message_counts(chatbot, config)
+        inputs = await _message_counts(chatbot, config, source="input")
+        for checkpoint_id in before:
+            # Warms the state cache, if the saver has one
+            await chatbot.aget_state({"configurable": {"thread_id": "t", "checkpoint_id": checkpoint_id}})
+        removed = await compact_checkpoints(saver, policy)
+        after = await _message_counts(chatbot, config)
+        cursor = await conn.execute("SELECT checkpoint_id FROM checkpoints WHERE thread_id = 't'")
+        kept = {row[0] for row in await cursor.fetchall()}
+        # Every kept checkpoint reloads with the same messages as before compaction
+        for checkpoint_id in kept:
+            state = await chatbot.aget_state({"configurable": {"thread_id": "t", "checkpoint_id": checkpoint_id}})
+            assert len(state.values.get("messages", [])) == before[checkpoint_id], checkpoint_id
+        for checkpoint_id in set(before) - kept:
+            assert await saver.aget_tuple({"configurable": {"thread_id": "t", "checkpoint_id": checkpoint_id}}) is None
+        assert set(after) == kept
+        return removed, inputs, kept
+
+
+def test_turn_boundaries_keep_their_delta_chain(tmp_path):
+    removed, inputs, kept = asyncio.run(_run_compaction(tmp_path, RetentionPolicy(turn_boundary_after_days=-1)))
+    assert removed > 0
+    assert set(inputs) <= kept
+    assert sorted(inputs.values(), reverse=True) == list(range(20, -1, -2))
+
+
+def test_keep_last_keeps_its_delta_chain(tmp_path):
+    removed, _, _ = asyncio.run(_run_compaction(tmp_path, RetentionPolicy(keep_last=4)))
+    assert removed > 0
+
+
+def test_compaction_clears_the_state_cache(tmp_path):
+    removed, _, _ = asyncio.run(
+        _run_compaction(tmp_path, RetentionPolicy(keep_last=4), saver_class=_CachedSaver)
+    )
+    assert removed > 0
+
+
+def test_state_cache_hands_out_copies(tmp_path):
+    async def run():
+        async with aiosqlite.connect(str(tmp_path / "checkpoints.db")) as conn:
+            saver = _CachedSaver(conn)
+            graph = StateGraph(_State)
+            graph.add_node("echo", _echo)
+            graph.add_edge(START, "echo")
+            graph.add_edge("echo", END)
+            chatbot = graph.compile(checkpointer=saver)
+            config = {"configurable": {"thread_id": "t"}}
+            await chatbot.ainvoke({"messages": [HumanMessage(content="hi")]}, config)
+            first = await saver.aget_tuple(config)
+            first.checkpoint["channel_versions"].clear()
+            second = await saver.aget_tuple(config)
+            assert second.checkpoint["channel_versions"]
+            assert second is not await saver.aget_tuple(config)
+            assert saver.cache_hits >= 2
+
+    asyncio.run(run())
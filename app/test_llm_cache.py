@@ -0,0 +1,32 @@
+"""Cache keys ignore per-call ids but never the content of a request."""
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from llm_cache import cache_key
+
+
+def _prompt(args: dict, message_ids: str = "a", call_id: str = "call-1") -> str:
+    return dumps([
+        HumanMessage(content="look it up", id=f"{message_ids}-1"),
+        AIMessage(
+            content="",
+            id=f"{message_ids}-2",
+            tool_calls=[{"name": "lookup", "args": args, "id": call_id}],
+            response_metadata={"finish_reason": "STOP"},
+        ),
+        ToolMessage(content="found", tool_call_id=call_id, id=f"{message_ids}-3"),
+    ])
+
+
+def test_ids_and_metadata_do_not_change_the_key():
+    assert cache_key(_prompt({"id": 5}), "model") == cache_key(
+        _prompt({"id": 5}, message_ids="b", call_id="call-2"), "model"
+    )
+
+
+def test_tool_argument_named_id_changes_the_key():
+    assert cache_key(_prompt({"id": 5}), "model") != cache_key(_prompt({"id": 7}), "model")
+
+
+def test_model_changes_the_key():
+    assert cache_key(_prompt({"id": 5}), "model") != cache_key(_prompt({"id": 5}), "other")
@@ -0,0 +1,26 @@
+"""When the semantic cache may serve a stored answer, and when it must refuse."""
+from semantic_cache import SemanticCache, embed
+
+
+def _cache_with(query: str) -> SemanticCache:
+    cache = SemanticCache(max_entries=8)
+    cache.add(query, "stored answer", latency=1.0)
+    return cache
+
+
+def test_serves_a_rephrased_question():
+    hit = _cache_with("What can you do?").lookup("what can you do")
+    assert hit is not None and hit[1].answer == "stored answer"
+
+
+def test_refuses_swapped_words():
+    query, other = "convert 30 celsius to fahrenheit", "convert 30 fahrenheit to celsius"
+    # Close enough to pass the threshold on similarity alone
+    assert float(embed(query) @ embed(other)) >= 0.85
+    cache = _cache_with(query)
+    assert cache.lookup(other) is None
+    assert cache.stats()["refused"] == 1
+
+
+def test_refuses_a_different_number():
+    assert _cache_with("convert 30 celsius to fahrenheit").lookup("convert 40 celsius to fahrenheit") is None
@@ -0,0 +1,146 @@
+"""Thread titles: a local extractive titler plus an optional batched LLM refinement."""
+import asyncio
+import re
+from typing import Awaitable, Callable, Optional
+
+_TOKEN = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#.'&-]*")
+# Leading request phrasing that carries no topic
+_PREAMBLE = re.compile(
+    r"^\s*((hi|hey|hello|ok|okay|so|um|please|pls|thanks|thank you)\b[\s,!.]*)*"
+    r"((can|could|would|will) (you|u)|i (want|need|would like) (you )?to|help me( to)?|tell me|show me|"
+    r"let'?s|give me|explain( to me)?|what is|what are|what's|how (do|can|to)|who is|why (is|do|does))?\s*",
+    re.IGNORECASE,
+)
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further get got had has have
+having he her here hers herself him himself his how i if in into is it its itself just let like me more most
+my myself need no nor not now of off on once only or other our ours out over own please same she should so
+some such than that the their theirs them then there these they this those through to too under until up
+us very want was we were what when where which while who whom why will with would you your yours
+yourself hi hey hello thanks thank ok okay tell show give explain help know make something anything
+""".split())
+_MINOR_WORDS = frozenset({"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "vs", "with"})
+
+
+def _candidate_phrases(tokens: list[str]) -> list[list[str]]:
+    """Runs of content words between stop words (a cheap noun-phrase proxy).
+
+    "of" and "for" may join two runs, so "price of gold" stays one phrase.
+    """
+    phrases, current = [], []
+    for i, token in enumerate(tokens):
+        lower = token.lower()
+        if lower not in STOP_WORDS:
+            current.append(token)
+        elif lower in ("of", "for") and current and i + 1 < len(tokens) and tokens[i + 1].lower() not in STOP_WORDS:
+            current.append(lower)
+        elif current:
+            phrases.append(current)
+            current = []
+    if current:
+        phrases.append(current)
+    return phrases
+
+
+def _score(phrase: list[str], position: int) -> float:
+    content = [w for w in phrase if w.lower() not in _MINOR_WORDS]
+    score = float(len(content))
+    # Names, acronyms and numbers are usually the topic
+    score += sum(0.5 for w in content if w[0].isupper() or w.isupper() or any(c.isdigit() for c in w))
+    # Earlier phrases carry the topic more often than trailing details
+    return score / (1 + 0.15 * position)
+
+
+def _case(word: str, first: bool) -> str:
+    if word.isupper() and len(word) > 1 or any(c.isupper() for c in word[1:]) or any(c.isdigit() for c in word):
+        return word
+    if not first and word.lower() in _MINOR_WORDS:
+        return word.lower()
+    return word[:1].upper() + word[1:]
+
+
+def extractive_title(text: str, max_words: int = 5, fallback: str = "New Chat") -> str:
+    """Deterministic short title from the first message; no model, no network."""
+    text = _PREAMBLE.sub("", text.strip(), count=1)
+    tokens = [t.strip(".'-") for t in _TOKEN.findall(text)]
+    tokens = [t for t in tokens if t]
+    phrases = _candidate_phrases(tokens)
+    if not phrases:
+        words = tokens[:max_words]
+        return " ".join(_case(w, i == 0) for i, w in enumerate(words)) or fallback
+
+    # Pick the best-scoring phrases that fit, then keep them in reading order
+    ranked = sorted(range(len(phrases)), key=lambda i: -_score(phrases[i], i))
+    chosen, used = [ranked[0]], min(len(phrases[ranked[0]]), max_words)
+    for i in ranked[1:]:
+        if used + len(phrases[i]) <= max_words and _score(phrases[i], i) >= 1:
+            chosen.append(i)
+            used += len(phrases[i])
+    words = [w for i in sorted(chosen) for w in phrases[i]][:max_words]
+    while words and words[-1].lower() in _MINOR_WORDS:
+        words.pop()
+    return " ".join(_case(w, i == 0) for i, w in enumerate(words))
+
+
+def title_batch_prompt(queries: list[str], max_chars: int = 500) -> str:
+    """One prompt asking for a title per numbered query (see `TitleBatch` in the backend)."""
+    numbered = "\n".join(f"{i}. {q[:max_chars]!r}" for i, q in enumerate(queries, 1))
+    return (
+        "Generate a very short title (max 5 words) for each of these user queries. "
+        "Return one title per query, tagged with the query's number.\n\n" + numbered
+    )
+
+
+RefineBatch = Callable[[list[tuple[str, str]]], Awaitable[dict[str, str]]]
+
+
+class DeferredTitleRefiner:
+    """Collects (thread_id, first_message) pairs and refines them in batches.
+
+    The first request starts a `delay`-second window; everything queued by
+    then (up to `max_batch`, sooner if full) goes to `refine_batch` in one
+    call, which returns {thread_id: title}. Must be used on one event loop.
+    """
+
+    def __init__(self, refine_batch: RefineBatch, delay: float = 5.0, max_batch: int = 20):
+        self.refine_batch = refine_batch
+        self.delay = delay
+        self.max_batch = max_batch
+        self._pending: dict[str, tuple[str, asyncio.Future]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def refine(self, thread_id: str, query: str) -> Optional[str]:
+        """Refined title for the thread, or None if the batch failed."""
+        if thread_id in self._pending:
+            return await self._pending[thread_id][1]
+        future = asyncio.get_running_loop().create_future()
+        self._pending[thread_id] = (query, future)
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        self._flush_task = None
+        self._flush_now()
+
+    def _flush_now(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch: dict[str, tuple[str, asyncio.Future]]):
+        try:
+            titles = await self.refine_batch([(tid, query) for tid, (query, _) in batch.items()])
+        except Exception as e:
+            print(f"Title refinement error: {e}")
+            titles = {}
+        for thread_id, (_, future) in batch.items():
+            if not future.done():
+                future.set_result(titles.get(thread_id))
@@ -0,0 +1,137 @@
+"""TTL cache for the results of external-data tools.
+
+Weather, quotes and web searches are asked for again and again by different
+users within minutes. `cached_tool(tool, cache, ttl)` wraps a `BaseTool` so
+identical calls (after argument normalization) within `ttl` seconds share one
+result, and concurrent identical calls share one in-flight request.
+"""
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(value: Any) -> Any:
+    """Case- and whitespace-insensitive form of an argument value."""
+    if isinstance(value, str):
+        return _SPACES.sub(" ", value.strip()).casefold()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def tool_cache_key(tool_name: str, args: dict) -> str:
+    return tool_name + ":" + json.dumps(_normalize(args), sort_keys=True, default=str)
+
+
+def _is_cacheable(result: Any) -> bool:
+    # Provider errors are reported as {"error": ...}; those are retried next time
+    return not (isinstance(result, dict) and "error" in result)
+
+
+class ToolResultCache:
+    """LRU of tool results with a TTL per entry, plus single-flight coalescing.
+
+    Must be used on one event loop (the backend loop); nothing here blocks.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def _count(self, tool_name: str, counter: str):
+        counters = self._counters.setdefault(tool_name, {"hits": 0, "misses": 0, "coalesced": 0})
+        counters[counter] += 1
+
+    async def get_or_call(
+        self, tool_name: str, args: dict, ttl_seconds: float, call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        key = tool_cache_key(tool_name, args)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count(tool_name, "hits")
+                return entry[1]
+            del self._entries[key]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._count(tool_name, "coalesced")
+        else:
+            self._count(tool_name, "misses")
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, ttl_seconds, t))
+        # Shielded so one caller being cancelled does not cancel the others' request
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, ttl_seconds: float, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or not _is_cacheable(task.result()):
+            return
+        self._entries[key] = (time.monotonic() + ttl_seconds, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        hits = sum(c["hits"] + c["coalesced"] for c in self._counters.values())
+        calls = hits + sum(c["misses"] for c in self._counters.values())
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hit_rate": hits / calls if calls else 0.0,
+            "tools": {name: dict(c) for name, c in self._counters.items()},
+        }
+
+
+class CachedTool(BaseTool):
+    """A `BaseTool` whose async results are served from a `ToolResultCache`.
+
+    Name, description and argument schema are the wrapped tool's, so the
+    model sees the same tool. The sync path is not cached.
+    """
+
+    tool: BaseTool
+    cache: ToolResultCache
+    ttl_seconds: float
+
+    def _run(self, *args: Any, config: RunnableConfig, run_manager: Optional[CallbackManagerForToolRun] = None, **kwargs: Any):
+        callbacks = run_manager.get_child() if run_manager else None
+        return self.tool.invoke(kwargs, config={"callbacks": callbacks})
+
+    async def _arun(
+        self, *args: Any, config: RunnableConfig, run_manager: Optional[AsyncCallbackManagerForToolRun] = None, **kwargs: Any
+    ):
+        callbacks = run_manager.get_child() if run_manager else None
+        return await self.cache.get_or_call(
+            self.name, kwargs, self.ttl_seconds, lambda: self.tool.ainvoke(kwargs, config={"callbacks": callbacks})
+        )
+
+
+def cached_tool(tool: BaseTool, cache: ToolResultCache, ttl_seconds: float) -> CachedTool:
+    return CachedTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        response_format=tool.response_format,
+        tool=tool,
+        cache=cache,
+        ttl_seconds=ttl_seconds,
+    )
@@ -0,0 +1,199 @@
+"""Compaction of tool results before they are stored in the thread's messages.
+
+Every ToolMessage is re-sent to the model on later turns and re-serialized
+into every checkpoint, so only the fields the model needs are kept (a
+per-tool projection, then a length cap). The untouched output is saved in
+the `tool_outputs` table under a reference id kept in the message's
+`artifact`, where it can still be looked up. Binary content (images, files)
+and large raw outputs live in the artifact store and are referenced by hash.
+"""
+import json
+from typing import Any, Callable, Optional
+
+from langchain_core.messages import ToolMessage
+
+from artifact_store import ArtifactStore, is_artifact_ref
+
+TOOL_OUTPUTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tool_outputs (
+    ref TEXT PRIMARY KEY,
+    thread_id TEXT,
+    tool_name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Longest string kept inside a JSON result, and most list items
+_MAX_FIELD_CHARS = 500
+_MAX_ITEMS = 20
+
+
+def project_quote(data: dict) -> dict:
+    """Alpha Vantage GLOBAL_QUOTE -> price, change and trading day."""
+    quote = data.get("Global Quote")
+    if not quote:
+        return {"error": data.get("error") or "No quote found for this symbol"}
+    return {
+        "symbol": quote.get("01. symbol"),
+        "price": quote.get("05. price"),
+        "change": quote.get("09. change"),
+        "change_percent": quote.get("10. change percent"),
+        "trading_day": quote.get("07. latest trading day"),
+    }
+
+
+def project_weather(data: dict) -> dict:
+    """Weatherstack current weather -> place, time and the main readings."""
+    current, location = data.get("current"), data.get("location") or {}
+    if not current:
+        error = data.get("error")
+        return {"error": error.get("info") if isinstance(error, dict) else error or "No weather found for this city"}
+    return {
+        "location": ", ".join(p for p in (location.get("name"), location.get("country")) if p),
+        "local_time": location.get("localtime"),
+        "temperature_c": current.get("temperature"),
+        "feels_like_c": current.get("feelslike"),
+        "description": ", ".join(current.get("weather_descriptions") or []),
+        "humidity": current.get("humidity"),
+        "wind_kmh": current.get("wind_speed"),
+    }
+
+
+# Tool name -> projection of its decoded JSON result
+PROJECTIONS: dict[str, Callable[[Any], Any]] = {
+    "get_stock_price": project_quote,
+    "get_weather_data": project_weather,
+}
+# Tool name -> cap on the compacted result, in characters
+MAX_CHARS: dict[str, int] = {
+    "duckduckgo_search": 1500,
+}
+
+
+def _cap(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # Prefer ending on a sentence or line boundary in the last fifth
+    end = max(cut.rfind(". "), cut.rfind("\n"))
+    if end > limit * 0.8:
+        cut = cut[:end + 1]
+    return cut.rstrip() + " … [truncated]"
+
+
+def _prune(value: Any) -> Any:
+    """Drop empty fields, shorten long strings and long lists."""
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        items = [_prune(v) for v in value[:_MAX_ITEMS]]
+        if len(value) > _MAX_ITEMS:
+            items.append(f"… {len(value) - _MAX_ITEMS} more")
+        return items
+    if isinstance(value, str):
+        return _cap(value, _MAX_FIELD_CHARS)
+    return value
+
+
+def _compact_text(tool_name: str, text: str, limit: int) -> str:
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            data = json.loads(stripped)
+        except ValueError:
+            pass
+        else:
+            projection = PROJECTIONS.get(tool_name)
+            if projection is not None and isinstance(data, dict):
+                data = projection(data)
+            return _cap(json.dumps(_prune(data), ensure_ascii=False), limit)
+    return _cap(stripped, limit)
+
+
+def externalize_blocks(content: Any, store: ArtifactStore) -> tuple[Any, list[dict]]:
+    """Move base64 content blocks into `store`; the blocks keep only the reference."""
+    if not isinstance(content, list):
+        return content, []
+    blocks, refs = [], []
+    for block in content:
+        if isinstance(block, dict) and block.get("type") != "text" and isinstance(block.get("base64"), str):
+            ref = store.put_base64(block["base64"], block.get("mime_type") or "application/octet-stream")
+            refs.append(ref)
+            block = {k: v for k, v in block.items() if k != "base64"} | ref
+        blocks.append(block)
+    return blocks, refs
+
+
+def compact_content(tool_name: str, content: Any, default_max_chars: int = 2000) -> Any:
+    """The part of a tool result worth keeping in the conversation.
+
+    Text and JSON are projected and capped; non-text content blocks (images,
+    files, embedded resources) are replaced by a short placeholder.
+    """
+    limit = MAX_CHARS.get(tool_name, default_max_chars)
+    if isinstance(content, str):
+        return _compact_text(tool_name, content, limit)
+    if not isinstance(content, list):
+        return content
+    blocks = []
+    for block in content:
+        if isinstance(block, str):
+            blocks.append(_compact_text(tool_name, block, limit))
+        elif isinstance(block, dict) and block.get("type") == "text":
+            blocks.append({**block, "text": _compact_text(tool_name, block.get("text", ""), limit)})
+        else:
+            kind = block.get("type", "content") if isinstance(block, dict) else type(block).__name__
+            where = "stored as an artifact" if is_artifact_ref(block) else "omitted from the conversation"
+            blocks.append({"type": "text", "text": f"[{kind} {where}]"})
+    return blocks
+
+
+def compact_tool_message(
+    message: ToolMessage, ref: str, default_max_chars: int = 2000, artifacts: Optional[list[dict]] = None
+) -> Optional[ToolMessage]:
+    """Compacted copy of `message` pointing at `ref`, or None if nothing would change.
+
+    `artifacts` (references from `externalize_blocks`) are listed in the
+    message artifact so the UI can render them.
+    """
+    content = compact_content(message.name or "", message.content, default_max_chars)
+    if content == message.content and message.artifact is None and not artifacts:
+        return None
+    artifact = {"raw_ref": ref}
+    if artifacts:
+        artifact["artifacts"] = artifacts
+    return message.model_copy(update={"content": content, "artifact": artifact})
+
+
+def raw_payload(message: ToolMessage) -> str:
+    return json.dumps({"content": message.content, "artifact": message.artifact}, ensure_ascii=False, default=str)
+
+
+def spill_payload(payload: str, store: ArtifactStore, inline_max: int = 8192) -> str:
+    """`payload`, or a pointer to it in `store` if it is longer than `inline_max`."""
+    if len(payload) <= inline_max:
+        return payload
+    return json.dumps({"stored_as": store.put(payload, "application/json")})
+
+
+async def save_tool_output(conn, ref: str, thread_id: Optional[str], tool_name: str, payload: str):
+    await conn.execute(
+        "INSERT OR REPLACE INTO tool_outputs (ref, thread_id, tool_name, payload) VALUES (?, ?, ?, ?)",
+        (ref, thread_id, tool_name, payload),
+    )
+
+
+async def load_tool_output(conn, ref: str) -> Optional[str]:
+    cursor = await conn.execute("SELECT payload FROM tool_outputs WHERE ref = ?", (ref,))
+    row = await cursor.fetchone()
+    return row[0] if row else None
+
+
+def decode_tool_output(payload: str, store: ArtifactStore) -> dict:
+    """The original {"content", "artifact"} of a compacted tool result."""
+    data = json.loads(payload)
+    if is_artifact_ref(data.get("stored_as")):
+        data = json.loads(store.read_text(data["stored_as"]))
+    return data
@@ -0,0 +1,81 @@
+"""Pick the tools worth binding for a turn by matching the query against tool descriptions."""
+import re
+from collections import Counter
+from typing import Iterable
+
+import numpy as np
+from langchain_core.tools import BaseTool
+
+from titler import STOP_WORDS
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _features(text: str) -> Counter:
+    """Stop-word-free words (crudely de-pluralized) plus their char trigrams at half weight."""
+    # Split snake_case / camelCase tool names into words
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text).replace("_", " ").lower()
+    counts: Counter = Counter()
+    for word in _WORD.findall(text):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        counts[word] += 1.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts["#" + padded[i:i + 3]] += 0.5
+    return counts
+
+
+def tool_document(tool: BaseTool) -> str:
+    """Name, description and argument names/descriptions of a tool."""
+    parts = [tool.name, tool.name, tool.description or ""]
+    for arg, spec in (tool.args or {}).items():
+        parts.append(arg)
+        if isinstance(spec, dict):
+            parts.append(str(spec.get("description", "")))
+    return " ".join(parts)
+
+
+class ToolIndex:
+    """TF-IDF index over the tool set, built once per tool list."""
+
+    def __init__(self, tools: list[BaseTool]):
+        self.names = [t.name for t in tools]
+        docs = [_features(tool_document(t)) for t in tools]
+        vocab = sorted({f for doc in docs for f in doc})
+        self._column = {f: i for i, f in enumerate(vocab)}
+        df = np.zeros(len(vocab), dtype=np.float32)
+        self._matrix = np.zeros((len(tools), len(vocab)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            for feature, count in doc.items():
+                self._matrix[row, self._column[feature]] = 1.0 + np.log(count)
+                df[self._column[feature]] += 1
+        self._idf = np.log((1 + len(tools)) / (1 + df)) + 1.0
+        self._matrix *= self._idf
+        norms = np.linalg.norm(self._matrix, axis=1, keepdims=True)
+        self._matrix /= np.where(norms == 0, 1.0, norms)
+
+    def scores(self, query: str) -> np.ndarray:
+        vector = np.zeros(len(self._column), dtype=np.float32)
+        for feature, count in _features(query).items():
+            column = self._column.get(feature)
+            if column is not None:
+                vector[column] = 1.0 + np.log(count)
+        vector *= self._idf
+        norm = np.linalg.norm(vector)
+        return self._matrix @ (vector / norm) if norm else np.zeros(len(self.names), dtype=np.float32)
+
+    def select(self, query: str, k: int, always: Iterable[str] = ()) -> tuple[str, ...]:
+        """Names of `always` plus the best-matching tools, at least `k` in all, in tool-list order.
+
+        Ties (including no match at all) go to tools earlier in the list, so
+        the built-in tools are the default choice.
+        """
+        chosen = {name for name in always if name in self.names}
+        for i in np.argsort(-self.scores(query), kind="stable"):
+            if len(chosen) >= k:
+                break
+            chosen.add(self.names[i])
+        return tuple(name for name in self.names if name in chosen)
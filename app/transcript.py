@@ -0,0 +1,154 @@
+"""Denormalized per-thread transcript of what the chat UI displays."""
+import json
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+TRANSCRIPT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcript (
+    thread_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    display_text TEXT NOT NULL,
+    source TEXT NOT NULL,
+    -- JSON list of artifact-store references shown with this entry, if any
+    artifacts TEXT,
+    PRIMARY KEY (thread_id, seq),
+    UNIQUE (thread_id, source)
+)
+"""
+
+# Threads materialized by the one-off backfill, including those with nothing to show
+TRANSCRIPT_BACKFILLED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcript_backfilled (
+    thread_id TEXT PRIMARY KEY
+)
+"""
+
+
+async def ensure_transcript_schema(conn):
+    """Create the transcript tables, adding columns missing from older databases."""
+    await conn.execute(TRANSCRIPT_SCHEMA)
+    await conn.execute(TRANSCRIPT_BACKFILLED_SCHEMA)
+    cursor = await conn.execute("PRAGMA table_info(transcript)")
+    if "artifacts" not in {row[1] for row in await cursor.fetchall()}:
+        await conn.execute("ALTER TABLE transcript ADD COLUMN artifacts TEXT")
+
+
+def display_text(message: Any) -> Optional[tuple[str, str]]:
+    """(role, text) shown for a message, or None for tool traffic the UI hides."""
+    # Skip ToolMessage (raw JSON tool output) and AIMessages that only request tools
+    if isinstance(message, ToolMessage) or not isinstance(message, (HumanMessage, AIMessage)):
+        return None
+    content = message.content
+    if isinstance(content, list):
+        content = "".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )
+    content = str(content)
+    if not content:
+        return None
+    return ("user" if isinstance(message, HumanMessage) else "assistant"), content
+
+
+def transcript_entry(message: Any) -> Optional[tuple[str, str, Optional[str]]]:
+    """(role, text, artifacts JSON) stored for a message, or None if nothing is shown.
+
+    Tool results are hidden, except for the artifacts they produced (listed
+    under "artifacts" in the ToolMessage artifact), which get an entry with
+    no text.
+    """
+    if isinstance(message, ToolMessage):
+        refs = message.artifact.get("artifacts") if isinstance(message.artifact, dict) else None
+        return ("assistant", "", json.dumps(refs)) if refs else None
+    shown = display_text(message)
+    return (*shown, None) if shown else None
+
+
+async def append_transcript(conn, thread_id: str, entries: list[tuple]):
+    """Append (source, role, text[, artifacts JSON]) entries after the thread's last seq.
+
+    `source` identifies the checkpoint write an entry came from, so replaying
+    the same write is a no-op.
+    """
+    cursor = await conn.execute(
+        "SELECT COALESCE(MAX(seq), -1) FROM transcript WHERE thread_id = ?", (thread_id,)
+    )
+    (last_seq,) = await cursor.fetchone()
+    await conn.executemany(
+        "INSERT OR IGNORE INTO transcript (thread_id, seq, role, display_text, source, artifacts) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (thread_id, last_seq + 1 + i, entry[1], entry[2], entry[0], entry[3] if len(entry) > 3 else None)
+            for i, entry in enumerate(entries)
+        ],
+    )
+
+
+async def read_transcript(conn, thread_id: str, last_n: Optional[int] = None) -> list[dict]:
+    """[{"role", "content", "artifacts"}], oldest first.
+
+    Artifact-only entries (from tool results) are folded into the assistant
+    answer that follows them, as the chat UI shows them while streaming.
+    """
+    if last_n is None:
+        cursor = await conn.execute(
+            "SELECT role, display_text, artifacts FROM transcript WHERE thread_id = ? ORDER BY seq", (thread_id,)
+        )
+    else:
+        cursor = await conn.execute(
+            """SELECT role, display_text, artifacts FROM (
+                SELECT seq, role, display_text, artifacts FROM transcript
+                WHERE thread_id = ? ORDER BY seq DESC LIMIT ?
+            ) ORDER BY seq""",
+            (thread_id, last_n),
+        )
+    history, pending = [], []
+    for role, text, artifacts in await cursor.fetchall():
+        refs = json.loads(artifacts) if artifacts else []
+        if not text:
+            pending += refs
+            continue
+        if role == "assistant":
+            refs, pending = pending + refs, []
+        history.append({"role": role, "content": text, "artifacts": refs})
+    if pending:
+        history.append({"role": "assistant", "content": "", "artifacts": pending})
+    return history
+
+
+class TranscriptSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver that mirrors displayable messages into `transcript`.
+
+    Entries are derived from the "messages" writes of each task and queued on
+    the connection manager's writer right after the writes are stored.
+    """
+
+    def __init__(self, conn, *, db, serde=None):
+        super().__init__(conn, serde=serde)
+        self.db = db
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await super().aput_writes(config, writes, task_id, task_path)
+        conf = config["configurable"]
+        entries = []
+        for idx, (channel, value) in enumerate(writes):
+            if channel != "messages":
+                continue
+            for n, message in enumerate(value if isinstance(value, list) else [value]):
+                entry = transcript_entry(message)
+                if entry:
+                    entries.append((f"{conf['checkpoint_id']}:{task_id}:{idx}:{n}", *entry))
+        if entries:
+            thread_id = str(conf["thread_id"])
+            await self.db.write(lambda c: append_transcript(c, thread_id, entries))
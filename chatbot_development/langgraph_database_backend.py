@@ -124,10 +124,12 @@ chatbot = graph.compile(checkpointer=checkpointer)
 # ---------------------- For debugging only ----------------------
 # Print existing thread IDs in message DB
 def list_message_threads():
-    threads = set()
-    for checkpoint in checkpointer.list(None):
-        threads.add(checkpoint.config["configurable"]["thread_id"])
-    return threads
+    # Read distinct ids off the checkpoints primary key instead of
+    # deserializing every checkpoint
+    checkpointer.setup()
+    with checkpointer.lock:
+        cursor = conn.execute("SELECT DISTINCT thread_id FROM checkpoints")
+        return {row[0] for row in cursor.fetchall()}
 
 if __name__ == "__main__":
     # CONFIG = {'configurable':{'thread_id':'thread-1'}}
@@ -11,7 +11,8 @@ from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import sqlite3
-import requests
+import httpx
+from concurrent.futures import Future, ThreadPoolExecutor
 import os 
 from datetime import datetime
 
@@ -58,25 +59,39 @@ def calculator(first_num: float, second_num: float, operation: str) -> dict:
     except Exception as e:
         return {"error": str(e)}
     
+# This graph runs synchronously (ToolNode fans tool calls out to threads), so
+# the tools share one pooled sync client: keep-alive plus hard timeouts.
+http_client = httpx.Client(
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30),
+    timeout=httpx.Timeout(10.0, connect=3.0, pool=5.0),
+)
+
 @tool
 def get_stock_price(symbol: str) -> dict:
     """
     Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
     using Alpha Vantage with API key in the URL.
     """
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={os.environ.get('ALPHA_VANTAGE_API')}"
-    r = requests.get(url)
-    return r.json()
+    params = {"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": os.environ.get("ALPHA_VANTAGE_API")}
+    try:
+        r = http_client.get("https://www.alphavantage.co/query", params=params)
+        r.raise_for_status()
+        return r.json()
+    except httpx.HTTPError as e:
+        return {"error": f"Stock price request failed: {e!r}"}
 
 @tool
 def get_weather_data(city: str) -> str:
     """
     This function fetches the current weather data for a given city
     """
-    WEATHER_STACK_API = os.environ.get('WEATHER_STACK_API')
-    url = f'https://api.weatherstack.com/current?access_key={WEATHER_STACK_API}&query={city}'
-    response = requests.get(url)
-    return response.json()
+    params = {"access_key": os.environ.get("WEATHER_STACK_API"), "query": city}
+    try:
+        response = http_client.get("https://api.weatherstack.com/current", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        return {"error": f"Weather request failed: {e!r}"}
 
 @tool
 def get_current_datetime() -> dict:
@@ -153,13 +168,32 @@ chatbot = graph.compile(checkpointer=checkpointer)
 # 7. Helper
 # -------------------
 
-# Store title in DB
+# Store title in DB (may run on the title worker, so share the checkpointer's lock)
 def save_thread_title(thread_id: str, title: str):
-    conn.execute(
-        "INSERT OR REPLACE INTO threads (thread_id, title) VALUES (?, ?)",
-        (thread_id, title)
-    )
-    conn.commit()
+    with checkpointer.lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO threads (thread_id, title) VALUES (?, ?)",
+            (thread_id, title)
+        )
+        conn.commit()
+
+# Generate a title for a new thread from its first message and store it
+def generate_thread_title(thread_id: str, query: str) -> str:
+    try:
+        prompt = f"Generate a very short title (max 5 words) for this user query: '{query}'. Only output the title."
+        response = title_llm.invoke(prompt)
+        title = response.title.strip()
+    except Exception as e:
+        print(f"Title generation error: {e}")
+        title = query[:30] + "..."
+    save_thread_title(thread_id, title)
+    return title
+
+# Titles are generated off the request path, alongside the first answer
+_title_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="title")
+
+def submit_thread_title(thread_id: str, query: str) -> Future:
+    return _title_executor.submit(generate_thread_title, thread_id, query)
 
 # Fetch all thread titles from DB -> dict format {thread_id: title}
 def get_all_threads():
@@ -189,10 +223,12 @@ def delete_thread(thread_id: str):
 # ---------------------- For debugging only ----------------------
 # Print existing thread IDs in message DB
 def list_message_threads():
-    threads = set()
-    for checkpoint in checkpointer.list(None):
-        threads.add(checkpoint.config["configurable"]["thread_id"])
-    return threads
+    # Read distinct ids off the checkpoints primary key instead of
+    # deserializing every checkpoint
+    checkpointer.setup()
+    with checkpointer.lock:
+        cursor = conn.execute("SELECT DISTINCT thread_id FROM checkpoints")
+        return {row[0] for row in cursor.fetchall()}
 
 if __name__ == "__main__":
     # CONFIG = {'configurable':{'thread_id':'thread-1'}}
@@ -5,22 +5,11 @@ from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 # Import backend utilities
 from langgraph_tool_backend import (
     chatbot,
-    title_llm,
-    save_thread_title,
+    submit_thread_title,
     get_all_threads,
     delete_thread
 )
 
-# -------------------- Title generation LLM --------------------
-def get_ai_title_for_query(query: str) -> str:
-    try:
-        prompt = f"Generate a very short title (max 5 words) for this user query: '{query}'. Only output the title."
-        response = title_llm.invoke(prompt)
-        return response.title.strip()
-    except Exception as e:
-        print(f"Title generation error: {e}")
-        return query[:30] + "..."
-
 # -------------------- Utility functions --------------------
 def generate_threadid():
     return str(uuid.uuid4())
@@ -89,6 +78,17 @@ if st.session_state['thread_id'] not in st.session_state['chat_threads']:
 if 'delete_confirmations' not in st.session_state:
     st.session_state.delete_confirmations = {}
 
+# Titles being generated in the background: thread_id -> future
+if 'pending_titles' not in st.session_state:
+    st.session_state['pending_titles'] = {}
+
+# Pick up titles that finished since the last rerun
+for thread_id, title_task in list(st.session_state['pending_titles'].items()):
+    if title_task.done():
+        del st.session_state['pending_titles'][thread_id]
+        if thread_id in st.session_state['chat_threads'] and title_task.exception() is None:
+            st.session_state['chat_threads'][thread_id] = title_task.result()
+
 # -------------------- Sidebar --------------------
 st.sidebar.title("LangGraph ChatBot")
 
@@ -175,6 +175,12 @@ if user_input:
     with st.chat_message("user"):
         st.write(user_input)
 
+    # Title the new thread concurrently with the first answer
+    if is_first_message:
+        st.session_state['pending_titles'][st.session_state['thread_id']] = submit_thread_title(
+            st.session_state['thread_id'], user_input
+        )
+
     # Send to LangGraph and langsmith
     CONFIG = {
         "configurable": {"thread_id": st.session_state["thread_id"]},
@@ -258,16 +264,8 @@ if user_input:
     # Save to session history
     st.session_state['message_history'].append({"role": "assistant", "content": ai_message})
 
-    # Handle first-message title creation + DB saving
-    if is_first_message:
-        new_title = get_ai_title_for_query(user_input)
-
-        thread_id = st.session_state['thread_id']
-
-        # Save title in DB
-        save_thread_title(thread_id, new_title)
-
-        # Update UI dictionary
-        st.session_state['chat_threads'][thread_id] = new_title
-
+    # Show the new title right away if it is already in; otherwise the
+    # sidebar picks it up on the next rerun
+    title_task = st.session_state['pending_titles'].get(st.session_state['thread_id'])
+    if title_task is not None and title_task.done():
         st.rerun()